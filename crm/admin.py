@@ -1,5 +1,7 @@
 from django.contrib import admin
 from unfold.admin import ModelAdmin, TabularInline
+
+from qr_handler.autocomplete import FastAutocompleteMixin
 from .models import Client, PhoneNumber
 
 
@@ -12,9 +14,9 @@ class PhoneNumberInline(TabularInline):
 
 
 @admin.register(Client)
-class ClientAdmin(ModelAdmin):
+class ClientAdmin(FastAutocompleteMixin, ModelAdmin):
     list_display = ['full_name', 'get_phone_numbers', 'created_at', 'updated_at']
-    search_fields = ['full_name', 'phone_numbers__number']
+    search_fields = ['full_name']
     inlines = [PhoneNumberInline]
     list_filter = ['created_at', 'updated_at']
     readonly_fields = ['created_at', 'updated_at']
@@ -26,6 +28,37 @@ class ClientAdmin(ModelAdmin):
     actions_on_top = True
     actions_on_bottom = False
 
+    def get_queryset(self, request):
+        """
+        Телефоны клиентов загружаются одним запросом на страницу.
+        """
+        return super().get_queryset(request).prefetch_related('phone_numbers')
+
+    def get_autocomplete_queryset(self, request, term):
+        """
+        Автодополнение: телефон или его окончание — через индекс номеров,
+        иначе — по началу ФИО (на PostgreSQL по индексу UPPER(full_name)).
+        """
+        queryset = self.get_queryset(request)
+        if PhoneNumber.is_phone_query(term):
+            return queryset.filter(pk__in=PhoneNumber.objects.matching(term).values('client_id'))
+        if term:
+            return queryset.filter(full_name__istartswith=term.strip())
+        return queryset
+
+    def serialize_autocomplete_result(self, obj):
+        phones = [phone.number for phone in obj.phone_numbers.all()]
+        return {"text": f"{obj.full_name} ({', '.join(phones)})", "phones": phones}
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Номер телефона или его окончание ищется через нормализованный индекс номеров,
+        остальные запросы — по ФИО. Используется и в автодополнении клиентов.
+        """
+        if PhoneNumber.is_phone_query(search_term):
+            return queryset.filter(pk__in=PhoneNumber.objects.matching(search_term).values('client_id')), False
+        return super().get_search_results(request, queryset, search_term)
+
     def get_phone_numbers(self, obj):
         return obj.get_phone_numbers()
     get_phone_numbers.short_description = "Номера телефонов"
@@ -34,7 +67,7 @@ class ClientAdmin(ModelAdmin):
 @admin.register(PhoneNumber)
 class PhoneNumberAdmin(ModelAdmin):
     list_display = ['number', 'client']
-    search_fields = ['number', 'client__full_name']
+    search_fields = ['client__full_name']
     ordering = ['number']
     list_filter = ['client']
     form_layout = [
@@ -42,3 +75,11 @@ class PhoneNumberAdmin(ModelAdmin):
     ]
     compressed_fields = False
     warn_unsaved_form = True
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Поиск по номеру идёт через нормализованный индекс, остальные запросы — по ФИО клиента.
+        """
+        if PhoneNumber.is_phone_query(search_term):
+            return queryset & PhoneNumber.objects.matching(search_term), False
+        return super().get_search_results(request, queryset, search_term)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from crm.models import PhoneNumber
+
+
+class Command(BaseCommand):
+    help = "Заполняет нормализованный и перевёрнутый номер у всех телефонов."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Размер пачки обновления.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        batch, updated = [], 0
+        phones = PhoneNumber.objects.only("pk", "number", "normalized_number", "reversed_number")
+        for phone in phones.iterator(chunk_size=batch_size):
+            normalized_number = PhoneNumber.normalize(phone.number)
+            if (phone.normalized_number, phone.reversed_number) == (normalized_number, normalized_number[::-1]):
+                continue
+            phone.normalized_number = normalized_number
+            phone.reversed_number = normalized_number[::-1]
+            batch.append(phone)
+            if len(batch) >= batch_size:
+                updated += PhoneNumber.objects.bulk_update(batch, ["normalized_number", "reversed_number"])
+                batch = []
+        if batch:
+            updated += PhoneNumber.objects.bulk_update(batch, ["normalized_number", "reversed_number"])
+        self.stdout.write(self.style.SUCCESS(f"Нормализовано номеров: {updated}"))
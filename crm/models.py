@@ -13,6 +13,21 @@ class Client(models.Model):
         verbose_name_plural = "Клиенты"
         ordering = ['-created_at']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем ФИО, чтобы при сохранении понять, нужно ли обновлять поисковый индекс заказов
+        instance._loaded_full_name = instance.__dict__.get('full_name')
+        return instance
+
+    def full_name_changed(self):
+        """
+        Проверяет, изменилось ли ФИО с момента загрузки из базы.
+        Если исходное значение неизвестно, считается, что изменилось.
+        """
+        loaded_full_name = getattr(self, '_loaded_full_name', None)
+        return loaded_full_name is None or loaded_full_name != self.full_name
+
     def __str__(self):
         return f"{self.full_name} ({self.get_phone_numbers()})"
 
@@ -24,7 +39,25 @@ class Client(models.Model):
         return first_phone.number if first_phone else None
 
 
+class PhoneNumberQuerySet(models.QuerySet):
+    def matching(self, term):
+        """
+        Ищет номера по строке оператора: полный номер (от 10 цифр) сравнивается
+        с нормализованным номером, более короткий — как окончание номера
+        через индекс перевёрнутых цифр.
+        """
+        if not PhoneNumber.is_phone_query(term):
+            return self.none()
+        digits = re.sub(r"\D", "", term)
+        if len(digits) >= 10:
+            return self.filter(normalized_number=PhoneNumber.normalize(digits))
+        return self.filter(reversed_number__startswith=digits[::-1])
+
+
 class PhoneNumber(models.Model):
+    # Минимальное количество цифр для поиска по окончанию номера
+    MIN_SUFFIX_LENGTH = 4
+
     client = models.ForeignKey(
         Client,
         on_delete=models.CASCADE,
@@ -32,21 +65,62 @@ class PhoneNumber(models.Model):
         verbose_name="Клиент"
     )
     number = models.CharField("Номер телефона", max_length=20, unique=True)
+    normalized_number = models.CharField(
+        "Нормализованный номер", max_length=20, blank=True, db_index=True, editable=False
+    )
+    reversed_number = models.CharField(
+        "Номер в обратном порядке", max_length=20, blank=True, db_index=True, editable=False
+    )
+
+    objects = PhoneNumberQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Номер телефона"
         verbose_name_plural = "Номера телефонов"
         ordering = ['number']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем номер и клиента, чтобы обновлять поисковый индекс заказов только при их изменении
+        instance._loaded_number = instance.__dict__.get('number')
+        instance._loaded_client_id = instance.__dict__.get('client_id')
+        return instance
+
     def __str__(self):
         return self.number
 
     def clean(self):
+        self.number = re.sub(r"[ \-]", "", self.number)
         phone_pattern = r'^\+?\d{10,15}$'
         if not re.match(phone_pattern, self.number):
             raise ValidationError("Номер телефона должен содержать только цифры и может начинаться с '+'.")
-        self.number = re.sub(r"[ \-]", "", self.number)
+
+    @staticmethod
+    def normalize(number):
+        """
+        Приводит номер к виду 7XXXXXXXXXX: оставляет только цифры,
+        заменяет ведущую 8 на 7 и добавляет 7 к десятизначному номеру.
+        """
+        digits = re.sub(r"\D", "", number or "")
+        if len(digits) == 11 and digits.startswith("8"):
+            digits = "7" + digits[1:]
+        elif len(digits) == 10:
+            digits = "7" + digits
+        return digits
+
+    @classmethod
+    def is_phone_query(cls, term):
+        """
+        Проверяет, похожа ли строка поиска на номер телефона или его окончание.
+        """
+        term = (term or "").strip()
+        return bool(re.fullmatch(r"\+?[\d\s\-()]+", term)) and len(re.sub(r"\D", "", term)) >= cls.MIN_SUFFIX_LENGTH
 
     def save(self, *args, **kwargs):
-        self.clean()
+        # Проверка номера выполняется в full_clean() (формы админки), здесь только производные поля
+        self.normalized_number = self.normalize(self.number)
+        self.reversed_number = self.normalized_number[::-1]
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "normalized_number", "reversed_number"}
         super().save(*args, **kwargs)
@@ -0,0 +1,21 @@
+from django.db import connections
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+from .models import Client
+
+
+@receiver(post_migrate)
+def create_client_name_index(sender, using="default", **kwargs):
+    """
+    Создаёт индекс по UPPER(full_name) для поиска клиентов по началу ФИО (istartswith)
+    на PostgreSQL. Миграций в проекте нет, поэтому индекс создаётся после migrate.
+    """
+    connection = connections[using]
+    if sender.name != 'crm' or connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS crm_client_full_name_upper_idx "
+            f"ON {Client._meta.db_table} (UPPER(full_name::text) text_pattern_ops)"
+        )
@@ -1,3 +1,63 @@
+from django.core.exceptions import ValidationError
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Client, PhoneNumber
+
+
+class PhoneNumberNormalizeTest(TestCase):
+    """
+    Нормализация номеров к виду 7XXXXXXXXXX.
+    """
+
+    def test_leading_eight_is_replaced(self):
+        self.assertEqual(PhoneNumber.normalize("87011234567"), "77011234567")
+
+    def test_ten_digits_get_country_code(self):
+        self.assertEqual(PhoneNumber.normalize("7011234567"), "77011234567")
+
+    def test_plus_seven_and_separators(self):
+        self.assertEqual(PhoneNumber.normalize("+7 (701) 123-45-67"), "77011234567")
+
+    def test_save_fills_normalized_fields(self):
+        client = Client.objects.create(full_name="Клиент")
+        phone = PhoneNumber.objects.create(client=client, number="8 701 123-45-67")
+
+        self.assertEqual(phone.normalized_number, "77011234567")
+        self.assertEqual(phone.reversed_number, "76543211077")
+
+    def test_validation_is_left_to_full_clean(self):
+        client = Client.objects.create(full_name="Клиент")
+        phone = PhoneNumber(client=client, number="8 701 123-45-67")
+        phone.full_clean()
+        self.assertEqual(phone.number, "87011234567")
+
+        with self.assertRaises(ValidationError):
+            PhoneNumber(client=client, number="12-ab").full_clean()
+
+
+class PhoneNumberMatchingTest(TestCase):
+    """
+    Поиск номеров по полному номеру и по окончанию.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        client = Client.objects.create(full_name="Клиент")
+        cls.phone = PhoneNumber.objects.create(client=client, number="+77011234567")
+        cls.other = PhoneNumber.objects.create(client=client, number="87029994567")
+
+    def matching(self, term):
+        return set(PhoneNumber.objects.matching(term))
+
+    def test_exact_match_in_any_format(self):
+        self.assertEqual(self.matching("87011234567"), {self.phone})
+        self.assertEqual(self.matching("+7 701 123 45 67"), {self.phone})
+        self.assertEqual(self.matching("7011234567"), {self.phone})
+
+    def test_suffix_match(self):
+        self.assertEqual(self.matching("4567"), {self.phone, self.other})
+        self.assertEqual(self.matching("23-45-67"), {self.phone})
+
+    def test_non_phone_terms(self):
+        self.assertEqual(self.matching("Иван"), set())
+        self.assertEqual(self.matching("567"), set())
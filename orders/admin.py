@@ -1,14 +1,13 @@
-import os
 from functools import lru_cache, partial
 
+from django import forms
 from django.contrib import admin
 from django.db.models import F
-from django.template.loader import render_to_string
 from django.urls import path, reverse
 from django.utils.safestring import mark_safe
 from django.contrib.admin import SimpleListFilter
-from django.http import HttpResponse, HttpResponseRedirect
-from import_export.formats import base_formats
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.shortcuts import redirect
 from django.views.generic import TemplateView
 from django.contrib import messages
 from import_export.formats.base_formats import XLSX
@@ -22,13 +21,13 @@ from unfold.views import UnfoldModelAdminViewMixin
 from simple_history.admin import SimpleHistoryAdmin
 from import_export.admin import ImportExportModelAdmin
 
-from xhtml2pdf import pisa
-from xhtml2pdf.files import pisaFileObject
 
-from sm_project import settings
+from qr_handler.autocomplete import FastAutocompleteFieldsMixin
+from .forms import BulkOrderForm
 from .models import Order
+from .receipts import ReceiptService
 from .resources import OrderResource
-from .services import OrderShelfService
+from .services import OrderShelfService, OrderIntakeService, OrderExportService, OrderSearchService
 
 
 
@@ -81,10 +80,70 @@ def filter_orders(request, field, value, title_prefix, admin_url="admin:orders_o
     return HttpResponseRedirect(f"{url}{query_string}")
 
 
+class BulkOrderIntakeView(UnfoldModelAdminViewMixin, TemplateView):
+    """
+    Пакетный приём заказов по манифесту фуры: все строки валидируются вместе
+    и создаются одной транзакцией через OrderIntakeService.
+    """
+    title = "Пакетный приём заказов"
+    permission_required = ("orders.add_order",)
+    template_name = "admin/bulk_order_intake.html"
+    default_rows = 10
+    max_rows = 200
+
+    def get_forms(self):
+        """
+        Создаёт форму маршрута и набор строк манифеста с виджетами админки.
+        """
+        formfield_callback = partial(self.model_admin.formfield_for_dbfield, request=self.request)
+        try:
+            rows = int(self.request.GET.get("rows", self.default_rows))
+        except ValueError:
+            rows = self.default_rows
+        rows = max(1, min(rows, self.max_rows))
+
+        manifest_form_class = forms.modelform_factory(
+            Order, fields=('route',), formfield_callback=formfield_callback
+        )
+        order_formset_class = forms.modelformset_factory(
+            Order, form=BulkOrderForm, extra=rows, formfield_callback=formfield_callback
+        )
+
+        data = self.request.POST if self.request.method == "POST" else None
+        manifest_form = manifest_form_class(data, prefix="manifest")
+        formset = order_formset_class(data, queryset=Order.objects.none(), prefix="orders")
+        return manifest_form, formset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if "formset" not in kwargs:
+            context["manifest_form"], context["formset"] = self.get_forms()
+        context["media"] = self.model_admin.media + context["manifest_form"].media + context["formset"].media
+        return context
+
+    def post(self, request, *args, **kwargs):
+        manifest_form, formset = self.get_forms()
+        if not (manifest_form.is_valid() and formset.is_valid()):
+            return self.render_to_response(self.get_context_data(manifest_form=manifest_form, formset=formset))
+
+        orders = formset.save(commit=False)
+        if not orders:
+            messages.error(request, "Заполните хотя бы одну строку манифеста.")
+            return self.render_to_response(self.get_context_data(manifest_form=manifest_form, formset=formset))
+
+        route = manifest_form.cleaned_data.get("route")
+        for order in orders:
+            order.route = route
+
+        created_orders = OrderIntakeService.bulk_create_orders(orders, user=request.user)
+        messages.success(request, f"Принято заказов: {len(created_orders)}.")
+        return redirect("admin:orders_order_changelist")
+
+
 # Админка OrderAdmin
 
 @admin.register(Order)
-class OrderAdmin(ModelAdmin, SimpleHistoryAdmin):
+class OrderAdmin(FastAutocompleteFieldsMixin, ModelAdmin, SimpleHistoryAdmin):
     """
     Админка для модели заказов с кастомными действиями и фильтрацией.
     """
@@ -93,6 +152,7 @@ class OrderAdmin(ModelAdmin, SimpleHistoryAdmin):
     # export_form_class = SelectableFieldsExportForm
     date_hierarchy = "date"
     actions_detail = ["generate_pdf"]
+    actions_list = ["bulk_intake"]
     list_filter_submit = True
     list_filter_sheet = False
     list_fullwidth = True
@@ -115,6 +175,15 @@ class OrderAdmin(ModelAdmin, SimpleHistoryAdmin):
         'shelf__unique_id',
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Поиск идёт по индексируемому полю `search_document` вместо icontains через JOIN
+        по клиентам и телефонам, поэтому DISTINCT не нужен.
+        """
+        if not search_term:
+            return queryset, False
+        return OrderSearchService.search(queryset, search_term), False
+
     def get_queryset(self, request):
         """
         Переопределяем метод для оптимизации запросов.
@@ -144,27 +213,33 @@ class OrderAdmin(ModelAdmin, SimpleHistoryAdmin):
             'classes': ('collapse',),
         }),
     )
-    actions = ['export_selected_to_excel']
+    actions = ['export_selected_to_excel', 'export_selected_to_csv']
 
     def export_selected_to_excel(self, request, queryset):
         """
         Экспортировать выбранные записи в Excel.
         """
-        resource = self.resource_class()
-        dataset = resource.export(queryset)
+        return FileResponse(
+            OrderExportService.write_xlsx(queryset),
+            as_attachment=True,
+            filename="selected_orders.xlsx",
+            content_type=XLSX().get_content_type(),
+        )
 
-        # Получение формата файла (XLSX)
-        file_format = base_formats.XLSX()
+    export_selected_to_excel.short_description = "Экспортировать выбранные записи в Excel"
 
-        # Генерация ответа с Excel-файлом
-        response = HttpResponse(
-            file_format.export_data(dataset),
-            content_type=file_format.get_content_type()
+    def export_selected_to_csv(self, request, queryset):
+        """
+        Экспортировать выбранные записи в CSV потоком.
+        """
+        response = StreamingHttpResponse(
+            OrderExportService.stream_csv(queryset),
+            content_type="text/csv; charset=utf-8",
         )
-        response['Content-Disposition'] = 'attachment; filename="selected_orders.xlsx"'
+        response['Content-Disposition'] = 'attachment; filename="selected_orders.csv"'
         return response
 
-    export_selected_to_excel.short_description = "Экспортировать выбранные записи в Excel"
+    export_selected_to_csv.short_description = "Экспортировать выбранные записи в CSV"
 
     # Добавляем кастомные URL
     def get_urls(self):
@@ -284,11 +359,6 @@ class OrderAdmin(ModelAdmin, SimpleHistoryAdmin):
         """
         Генерация PDF для выбранных заказов.
         """
-        if pisa is None:
-            return HttpResponse(
-                "Библиотека xhtml2pdf не установлена. Пожалуйста, установите её с помощью 'pip install xhtml2pdf'.",
-                status=500)
-
         # Если queryset отсутствует, пробуем получить один объект по object_id
         if queryset is None:
             object_id = kwargs.get("object_id")
@@ -297,50 +367,35 @@ class OrderAdmin(ModelAdmin, SimpleHistoryAdmin):
             else:
                 return HttpResponse("Не указан объект или выборка для генерации PDF.", status=400)
 
-        if not queryset.exists():
+        orders = list(ReceiptService.get_queryset(queryset))
+        if not orders:
             return HttpResponse("Нет доступных заказов для генерации PDF.", status=400)
 
-        # Подготовка контекста для рендера шаблона
-        context = {
-            'orders': queryset,
-            'company_name': "Перевозчик \u00abСауле \u2013 Марат\u00bb",
-            'contact_details': {
-                'almaty': {
-                    'address': "Рынок \u00abSalem\u00bb, Ангарская 107",
-                    'phone': "8778 869 5454, 8702 199 9507",
-                },
-                'astana': {
-                    'address': "ул. Пушкина 35",
-                    'working_hours': "9:00 - 14:00",
-                }
-            },
-            'notes': [
-                "Звонить через день после сдачи товара!",
-                "Выдача товара строго по квитанции!",
-                "Товар нужно забирать в день прибытия!",
-                "Хранение товара на складе платное!!!",
-                "Минимальная стоимость перевозки груза от 3000 тг",
-            ]
-        }
-
-        # Рендер HTML-шаблона
-        html = render_to_string('order_pdf_template.html', context)
+        try:
+            pdf = ReceiptService.render_pdf(orders)
+        except ValueError:
+            return HttpResponse("Ошибка при генерации PDF", status=500)
 
-        # Генерация PDF
-        response = HttpResponse(content_type='application/pdf')
+        response = HttpResponse(pdf, content_type='application/pdf')
         response['Content-Disposition'] = 'attachment; filename="orders.pdf"'
+        return response
 
-        pisa_status = pisa.CreatePDF(
-            src=html,
-            dest=response,
-            encoding='utf-8',  # Обеспечивает поддержку кириллицы
-            link_callback=link_callback)
-
-        # Проверка ошибок при генерации PDF
-        if pisa_status.err:
-            return HttpResponse("Ошибка при генерации PDF", status=500)
+    @action(
+        description="Пакетный приём",
+        url_path="bulk-intake",
+        permissions=["bulk_intake"],
+    )
+    def bulk_intake(self, request):
+        """
+        Страница пакетного приёма заказов по манифесту.
+        """
+        return BulkOrderIntakeView.as_view(model_admin=self)(request)
 
-        return response
+    def has_bulk_intake_permission(self, request, obj=None):
+        """
+        Пакетный приём доступен тем, кто может создавать заказы.
+        """
+        return self.has_add_permission(request)
 
     def has_generate_pdf_permission(self, request, obj=None):
         """
@@ -350,26 +405,3 @@ class OrderAdmin(ModelAdmin, SimpleHistoryAdmin):
         # Например, доступ только администраторам:
         return request.user.is_superuser
 
-
-def link_callback(uri, rel):
-    # use short variable names
-    sUrl = settings.STATIC_URL  # Typically /static/
-    sRoot = settings.STATICFILES_DIRS[0]  # Typically /home/userX/project_static/
-    mUrl = settings.MEDIA_URL  # Typically /static/media/
-    mRoot = settings.MEDIA_ROOT  # Typically /home/userX/project_static/media/
-    # convert URIs to absolute system paths
-    if uri.startswith(mUrl):
-        path = os.path.join(mRoot, uri.replace(mUrl, ""))
-    elif uri.startswith(sUrl):
-        path = os.path.join(sRoot, uri.replace(sUrl, ""))
-    else:
-        path = uri
-
-    pisaFileObject.getNamedFile = lambda self: path
-
-    # make sure that file exists
-    if not os.path.isfile(path):
-        raise Exception('media URI must start with %s or %s' % (sUrl, mUrl))
-
-    print(path)
-    return path
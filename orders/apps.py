@@ -8,3 +8,7 @@ class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
     verbose_name = "Заказы"
+
+    def ready(self):
+        # Регистрация обработчиков фоновых задач и сигналов
+        from . import jobs, signals  # noqa: F401
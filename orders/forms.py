@@ -0,0 +1,13 @@
+from django import forms
+
+from .models import Order
+
+
+class BulkOrderForm(forms.ModelForm):
+    """
+    Строка манифеста для пакетного приёма заказов.
+    """
+
+    class Meta:
+        model = Order
+        fields = ('sender', 'receiver', 'seat_count', 'price', 'paid_amount', 'is_cashless', 'comment')
@@ -0,0 +1,31 @@
+from services.job_queue_service import JobQueueService
+from .models import Order
+from .services import OrderSearchService
+
+
+@JobQueueService.register("orders.generate_qr_code")
+def generate_order_qr_code(order):
+    """
+    Генерирует QR-код заказа и сохраняет путь к файлу без создания записи в истории.
+    """
+    order.build_qr_code()
+    Order.objects.filter(pk=order.pk).update(qr_code=order.qr_code.name)
+
+
+@JobQueueService.register("orders.optimize_image")
+def optimize_order_image(order):
+    """
+    Оптимизирует загруженное фото заказа.
+    """
+    if not order.image:
+        return
+    order.build_optimized_image()
+    Order.objects.filter(pk=order.pk).update(image=order.image.name)
+
+
+@JobQueueService.register(OrderSearchService.REFRESH_TASK)
+def refresh_client_orders_search(client):
+    """
+    Пересчитывает поисковый индекс заказов клиента.
+    """
+    OrderSearchService.refresh_for_client(client.pk)
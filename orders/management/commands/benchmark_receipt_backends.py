@@ -0,0 +1,65 @@
+import time
+from itertools import cycle, islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.models import Order
+from orders.receipts import RECEIPT_BACKENDS, ReceiptService
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает движки генерации PDF-чеков по времени рендера и размеру файла. "
+        "Используются существующие заказы (повторяются, если их меньше, чем нужно); база не изменяется."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", default="1,50,500",
+            help="Количества чеков через запятую (по умолчанию 1,50,500).",
+        )
+        parser.add_argument(
+            "--backends", default=",".join(RECEIPT_BACKENDS),
+            help=f"Движки через запятую (по умолчанию {','.join(RECEIPT_BACKENDS)}).",
+        )
+        parser.add_argument("--repeat", type=int, default=1, help="Количество замеров для каждого варианта.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(value) for value in options["sizes"].split(",") if value.strip()]
+        except ValueError:
+            raise CommandError("--sizes должен быть списком чисел через запятую.")
+        if not sizes or min(sizes) < 1:
+            raise CommandError("Количество чеков должно быть не меньше 1.")
+
+        backends = [name.strip() for name in options["backends"].split(",") if name.strip()]
+        unknown = [name for name in backends if name not in RECEIPT_BACKENDS]
+        if unknown:
+            raise CommandError(f"Неизвестные движки: {', '.join(unknown)}. Доступны: {', '.join(RECEIPT_BACKENDS)}.")
+
+        orders = list(ReceiptService.get_queryset(Order.objects.order_by("-pk"))[:max(sizes)])
+        if not orders:
+            raise CommandError("Нет заказов для замера.")
+
+        for name in backends:
+            backend = ReceiptService.get_backend(name)
+            if not backend.is_available():
+                self.stdout.write(self.style.WARNING(f"{name}: недоступен, пропущен"))
+                continue
+
+            # Прогрев: загрузка шрифтов и библиотек не входит в замер
+            ReceiptService.render_pdf(orders[:1], workers=1, use_cache=False, backend=name)
+
+            for size in sizes:
+                selection = list(islice(cycle(orders), size))
+                timings = []
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    pdf = ReceiptService.render_pdf(selection, workers=1, use_cache=False, backend=name)
+                    timings.append(time.perf_counter() - started)
+
+                best = min(timings)
+                self.stdout.write(
+                    f"{name:<10}  чеков: {size:>4}  время: {best:7.2f} с  "
+                    f"на чек: {best / size * 1000:6.1f} мс  размер: {len(pdf) // 1024} КБ"
+                )
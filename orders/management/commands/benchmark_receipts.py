@@ -0,0 +1,64 @@
+import time
+from itertools import cycle, islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.models import Order
+from orders.receipts import ReceiptService
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет время генерации PDF-чеков при разном числе процессов. "
+        "Используются существующие заказы (повторяются, если их меньше, чем нужно); база не изменяется."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=300, help="Количество чеков в PDF.")
+        parser.add_argument(
+            "--workers", default="1,2,4",
+            help="Числа процессов через запятую (по умолчанию 1,2,4).",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=settings.RECEIPT_PDF_CHUNK_SIZE,
+            help="Заказов в одной пачке.",
+        )
+        parser.add_argument("--repeat", type=int, default=1, help="Количество замеров для каждого варианта.")
+
+    def handle(self, *args, **options):
+        try:
+            workers_options = [int(value) for value in options["workers"].split(",") if value.strip()]
+        except ValueError:
+            raise CommandError("--workers должен быть списком чисел через запятую.")
+        if not workers_options or min(workers_options) < 1:
+            raise CommandError("Число процессов должно быть не меньше 1.")
+
+        orders = list(ReceiptService.get_queryset(Order.objects.order_by("-pk"))[:options["orders"]])
+        if not orders:
+            raise CommandError("Нет заказов для замера.")
+        orders = list(islice(cycle(orders), options["orders"]))
+
+        self.stdout.write(f"Чеков: {len(orders)}, пачка: {options['chunk_size']}")
+        baseline = None
+        for workers in workers_options:
+            if workers > 1:
+                # Прогрев пула: запуск процессов не входит в замер
+                ReceiptService.render_pdf(orders[:2], workers=workers, chunk_size=1, use_cache=False)
+
+            timings = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                pdf = ReceiptService.render_pdf(
+                    orders, workers=workers, chunk_size=options["chunk_size"], use_cache=False
+                )
+                timings.append(time.perf_counter() - started)
+
+            best = min(timings)
+            baseline = baseline or best
+            self.stdout.write(
+                f"Процессов: {workers:>2}  время: {best:7.2f} с  "
+                f"ускорение: {baseline / best:4.2f}x  размер: {len(pdf) // 1024} КБ"
+            )
+
+        ReceiptService.reset_executor()
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from orders.models import Order
+from orders.services import OrderSearchService
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает поисковый индекс заказов и создаёт триграммный индекс на PostgreSQL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Размер пачки обновления.")
+
+    def handle(self, *args, **options):
+        OrderSearchService.create_search_index(connection)
+        updated = OrderSearchService.refresh(Order.objects.all(), batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Поисковый индекс обновлён у заказов: {updated}"))
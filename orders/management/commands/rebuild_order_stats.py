@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import OrderDailyStats
+from orders.services import OrderStatsService
+
+
+class Command(BaseCommand):
+    help = "Полностью пересчитывает таблицу дневной статистики заказов."
+
+    def handle(self, *args, **options):
+        rows = OrderDailyStats.rebuild()
+        OrderStatsService.invalidate_cache()
+        self.stdout.write(self.style.SUCCESS(f"Статистика пересчитана, строк: {rows}"))
@@ -1,5 +1,13 @@
-from django.db import models
+import os
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
 from crm.models import Client
+from services.job_queue_service import JobQueueService
 from services.order_image_service import OrderImageService
 from services.qr_code_service import QRCodeService
 from services.unique_number_service import UniqueNumberService
@@ -8,6 +16,60 @@ from warehouse.models import Shelf
 from simple_history.models import HistoricalRecords
 
 
+class DailySequence(models.Model):
+    """
+    Счётчик порядковых номеров в разрезе ключа и дня.
+    Используется `UniqueNumberService` для атомарной выдачи номеров.
+    """
+    key = models.CharField("Ключ последовательности", max_length=100)
+    day = models.DateField("День")
+    last_number = models.PositiveIntegerField("Последний номер", default=0)
+
+    class Meta:
+        verbose_name = "Счётчик номеров"
+        verbose_name_plural = "Счётчики номеров"
+        constraints = [
+            models.UniqueConstraint(fields=["key", "day"], name="unique_daily_sequence"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} {self.day:%d.%m.%y}: {self.last_number}"
+
+
+class OrderQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """
+        Массовое обновление с поддержкой таблицы дневной статистики:
+        при изменении полей статистики разница применяется к OrderDailyStats.
+        """
+        if not set(kwargs) & set(Order.STATS_FIELDS):
+            return super().update(**kwargs)
+
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list("pk", flat=True))
+            if not pks:
+                return 0
+            affected = self.model._default_manager.using(self.db).filter(pk__in=pks)
+            before = OrderDailyStats.collect(affected)
+            rows = super().update(**kwargs)
+            OrderDailyStats.apply(before, sign=-1)
+            OrderDailyStats.apply(OrderDailyStats.collect(affected), sign=1)
+
+        from .services import OrderStatsService
+        OrderStatsService.invalidate_cache()
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        OrderDailyStats.apply(
+            OrderDailyStats.collect_snapshots(obj.get_stats_snapshot() for obj in objs), sign=1
+        )
+
+        from .services import OrderStatsService
+        OrderStatsService.invalidate_cache()
+        return objs
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('accepted', 'Принят'),
@@ -56,55 +118,244 @@ class Order(models.Model):
     date = models.DateTimeField("Дата", auto_now_add=True)
     created_at = models.DateTimeField("Дата создания", auto_now_add=True)
     updated_at = models.DateTimeField("Дата обновления", auto_now=True)
+    search_document = models.TextField("Поисковый индекс", blank=True, default="", editable=False)
+
+    history = HistoricalRecords(excluded_fields=['search_document'])
 
-    history = HistoricalRecords()
+    objects = OrderQuerySet.as_manager()
+
+    # Поля, от которых зависит таблица дневной статистики
+    STATS_FIELDS = ('date', 'status', 'is_cashless', 'price', 'paid_amount')
 
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
         ordering = ['-date']
 
-    def save(self, *args, **kwargs):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем значения полей статистики, чтобы при сохранении посчитать разницу без запроса
+        if not set(cls.STATS_FIELDS) & instance.get_deferred_fields():
+            instance._stats_snapshot = instance.get_stats_snapshot()
+        return instance
+
+    def get_stats_snapshot(self):
         """
-        Сохраняет объект, оптимизирует изображение и генерирует номер заказа и QR-код.
+        Возвращает ключ и значения заказа для таблицы дневной статистики.
         """
-        is_new = self.pk is None
+        if self.date is None:
+            return None
+        return (
+            timezone.localdate(self.date), self.status, self.is_cashless,
+            Decimal(self.price), Decimal(self.paid_amount),
+        )
 
-        # Первичное сохранение нового объекта для получения `pk`
-        if is_new:
-            super().save(*args, **kwargs)
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет объект одной записью в базу. Генерация QR-кода и оптимизация
+        загруженного изображения ставятся в очередь фоновых задач.
+        """
+        is_new = self._state.adding
+        image_uploaded = bool(self.image) and not self.image._committed
 
         # Генерация номера заказа
         if not self.order_number:
             self.order_number = UniqueNumberService.generate_unique_number(Order)
-            super().save(update_fields=["order_number"])
-
-        # Генерация и сохранение QR-кода
-        if not self.qr_code:
-            QRCodeService.generate_qr_code(
-                instance=self,
-                qr_data=f"O{self.order_number}",
-                text_parts=[
-                    f"{self.order_number}",
-                    f"О:{self.sender.get_first_phone_number()}",
-                    f"П:{self.receiver.get_first_phone_number()}"
-                ],
-                file_prefix="O"
-            )
-            super().save(update_fields=["qr_code"])  # Обновляем только qr_code
-
-        # Оптимизация изображения перед сохранением
-        if self.image:
-            optimized_image = OrderImageService.optimize_image(self.image)
-            self.image.save(self.image.name, optimized_image, save=False)
 
         # Если статус изменяется на 'completed', убираем заказ с полки
         if self.status == 'completed' and self.shelf is not None:
             self.shelf = None
-        # Если объект не новый, сохраняем изменения как обычно
-        if not is_new:
-            super().save(*args, **kwargs)
 
+        if kwargs.get('update_fields') is None:
+            self.search_document = self.build_search_document()
+
+        super().save(*args, **kwargs)
+
+        if is_new and not self.qr_code:
+            JobQueueService.enqueue("orders.generate_qr_code", self)
+        if image_uploaded:
+            JobQueueService.enqueue("orders.optimize_image", self)
+
+    def build_search_document(self):
+        """
+        Собирает строку для поиска: номер заказа, ФИО и телефоны отправителя и получателя
+        в нижнем регистре. Телефоны берутся через `phone_numbers.all()`, поэтому при
+        пакетной обработке их стоит загрузить через prefetch_related.
+        """
+        parts = [self.order_number or ""]
+        for client in (self.sender, self.receiver):
+            parts.append(client.full_name)
+            for phone in client.phone_numbers.all():
+                parts.append(phone.number)
+                if phone.normalized_number and phone.normalized_number != phone.number:
+                    parts.append(phone.normalized_number)
+        return " ".join(part for part in parts if part).lower()
+
+    def build_qr_code(self):
+        """
+        Генерирует файл QR-кода заказа. Сама запись в базе не обновляется.
+        """
+        QRCodeService.generate_qr_code(
+            instance=self,
+            qr_data=f"O{self.order_number}",
+            text_parts=[
+                f"{self.order_number}",
+                f"О:{self.sender.get_first_phone_number()}",
+                f"П:{self.receiver.get_first_phone_number()}"
+            ],
+            file_prefix="O"
+        )
+
+    def build_optimized_image(self):
+        """
+        Заменяет файл изображения оптимизированной версией. Сама запись в базе не обновляется.
+        """
+        storage, old_name = self.image.storage, self.image.name
+        optimized_image = OrderImageService.optimize_image(self.image)
+        self.image.save(os.path.basename(old_name), optimized_image, save=False)
+        if self.image.name != old_name:
+            storage.delete(old_name)
 
     def __str__(self):
         return f"№{self.order_number} от {self.sender} к {self.receiver} на {self.price}₸"
+
+
+class OrderDailyStats(models.Model):
+    """
+    Предрассчитанные показатели заказов за день в разрезе статуса и способа оплаты.
+    Поддерживается инкрементально при изменении заказов, полностью
+    пересчитывается командой `manage.py rebuild_order_stats`.
+    """
+    day = models.DateField("День")
+    status = models.CharField("Статус заказа", max_length=20, choices=Order.STATUS_CHOICES)
+    is_cashless = models.BooleanField("Безналичный расчёт")
+    orders_count = models.IntegerField("Количество заказов", default=0)
+    price_sum = models.DecimalField("Сумма цен", max_digits=14, decimal_places=2, default=0)
+    paid_sum = models.DecimalField("Сумма оплат", max_digits=14, decimal_places=2, default=0)
+
+    # Групп в одном запросе apply: 6 параметров на группу, с запасом до лимита SQLite
+    UPSERT_BATCH_SIZE = 500
+
+    class Meta:
+        verbose_name = "Статистика заказов за день"
+        verbose_name_plural = "Статистика заказов по дням"
+        ordering = ['-day', 'status']
+        constraints = [
+            models.UniqueConstraint(fields=["day", "status", "is_cashless"], name="unique_order_daily_stats"),
+        ]
+
+    def __str__(self):
+        return f"{self.day:%d.%m.%y} {self.get_status_display()}: {self.orders_count}"
+
+    @staticmethod
+    def collect(queryset):
+        """
+        Группирует заказы выборки по ключу статистики одним запросом.
+
+        Returns:
+            Словарь {(день, статус, безнал): [количество, сумма цен, сумма оплат]}.
+        """
+        rows = (
+            queryset.order_by()
+            .annotate(day=TruncDate("date"))
+            .values("day", "status", "is_cashless")
+            .annotate(orders_count=Count("pk"), price_sum=Sum("price"), paid_sum=Sum("paid_amount"))
+        )
+        return {
+            (row["day"], row["status"], row["is_cashless"]): [
+                row["orders_count"], row["price_sum"] or 0, row["paid_sum"] or 0,
+            ]
+            for row in rows
+        }
+
+    @staticmethod
+    def collect_snapshots(snapshots):
+        """
+        Группирует снимки заказов (см. Order.get_stats_snapshot) по ключу статистики.
+        """
+        groups = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+        for snapshot in snapshots:
+            if snapshot is None:
+                continue
+            day, status, is_cashless, price, paid_amount = snapshot
+            group = groups[(day, status, is_cashless)]
+            group[0] += 1
+            group[1] += price
+            group[2] += paid_amount
+        return groups
+
+    @classmethod
+    def apply(cls, groups, sign=1):
+        """
+        Прибавляет (sign=1) или вычитает (sign=-1) сгруппированные значения.
+
+        Все группы применяются одним запросом INSERT ... ON CONFLICT DO UPDATE
+        (на каждые UPSERT_BATCH_SIZE групп), поэтому число запросов не зависит
+        от количества затронутых дней.
+        """
+        rows = [
+            (day, status, is_cashless, sign * orders_count, sign * price_sum, sign * paid_sum)
+            for (day, status, is_cashless), (orders_count, price_sum, paid_sum) in groups.items()
+            if orders_count or price_sum or paid_sum
+        ]
+        if not rows:
+            return
+
+        quote_name = connection.ops.quote_name
+        table = quote_name(cls._meta.db_table)
+        key_columns = [quote_name(cls._meta.get_field(name).column) for name in ("day", "status", "is_cashless")]
+        value_columns = [
+            quote_name(cls._meta.get_field(name).column) for name in ("orders_count", "price_sum", "paid_sum")
+        ]
+        columns = ", ".join(key_columns + value_columns)
+        assignments = ", ".join(f"{column} = {table}.{column} + EXCLUDED.{column}" for column in value_columns)
+        placeholder = f"({', '.join(['%s'] * len(key_columns + value_columns))})"
+
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), cls.UPSERT_BATCH_SIZE):
+                batch = rows[start:start + cls.UPSERT_BATCH_SIZE]
+                cursor.execute(
+                    f"INSERT INTO {table} ({columns}) VALUES {', '.join([placeholder] * len(batch))} "
+                    f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {assignments}",
+                    [value for row in batch for value in row],
+                )
+
+    @classmethod
+    def apply_change(cls, old_snapshot, new_snapshot):
+        """
+        Применяет изменение одного заказа: старые значения вычитаются, новые прибавляются.
+        """
+        if old_snapshot == new_snapshot:
+            return
+        groups = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+        for snapshot, sign in ((old_snapshot, -1), (new_snapshot, 1)):
+            if snapshot is None:
+                continue
+            day, status, is_cashless, price, paid_amount = snapshot
+            group = groups[(day, status, is_cashless)]
+            group[0] += sign
+            group[1] += sign * price
+            group[2] += sign * paid_amount
+        cls.apply(groups)
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls):
+        """
+        Полностью пересчитывает таблицу по текущим заказам.
+
+        Returns:
+            Количество созданных строк статистики.
+        """
+        cls.objects.all().delete()
+        stats = [
+            cls(
+                day=day, status=status, is_cashless=is_cashless,
+                orders_count=orders_count, price_sum=price_sum, paid_sum=paid_sum,
+            )
+            for (day, status, is_cashless), (orders_count, price_sum, paid_sum)
+            in cls.collect(Order.objects.all()).items()
+        ]
+        cls.objects.bulk_create(stats, batch_size=1000)
+        return len(stats)
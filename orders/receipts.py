@@ -0,0 +1,586 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
+from io import BytesIO
+from pathlib import Path
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import ImproperlyConfigured
+from django.template.loader import get_template
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib.fonts import addMapping
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from xhtml2pdf import default as pisa_default
+from xhtml2pdf import pisa
+
+
+def _init_worker():
+    """
+    Инициализация процесса пула: настройка Django и подготовка движка рендера.
+    """
+    if not apps.ready:
+        django.setup()
+    ReceiptService.get_backend().prepare()
+
+
+class ReceiptCache:
+    """
+    Кэш PDF-чеков на диске с адресацией по содержимому: у каждого заказа свой ключ —
+    хэш полей, которые выводятся в чеке, и версии шаблона. При изменении полей
+    у заказа появляется новый ключ, а старый файл вытесняется по LRU (время последнего
+    обращения хранится в mtime файла), когда кэш превышает максимальный размер.
+
+    Вытеснение обходит весь каталог, поэтому выполняется не чаще одного раза
+    в `evict_interval` секунд: время последнего запуска общее для всех процессов
+    и хранится в mtime файла-метки.
+    """
+    EVICT_MARKER = ".last-evict"
+
+    def __init__(self, directory, max_size, evict_interval=3600):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.evict_interval = evict_interval
+
+    def get_path(self, key):
+        return self.directory / key[:2] / f"{key}.pdf"
+
+    def get(self, key):
+        """
+        Возвращает PDF из кэша или None и отмечает обращение к файлу.
+        """
+        path = self.get_path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def set(self, key, data):
+        """
+        Сохраняет PDF в кэш. Запись атомарна: файл пишется во временный и переименовывается.
+        """
+        path = self.get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def evict_if_due(self):
+        """
+        Запускает вытеснение, если с прошлого запуска прошло больше `evict_interval` секунд.
+
+        :return: Количество удалённых файлов
+        """
+        marker = self.directory / self.EVICT_MARKER
+        try:
+            if time.time() - marker.stat().st_mtime < self.evict_interval:
+                return 0
+        except OSError:
+            pass
+        self.directory.mkdir(parents=True, exist_ok=True)
+        marker.touch()
+        return self.evict()
+
+    def evict(self):
+        """
+        Удаляет давно не использованные файлы, пока размер кэша превышает максимальный.
+
+        :return: Количество удалённых файлов
+        """
+        entries = []
+        for path in self.directory.glob("*/*.pdf"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """
+        Удаляет все файлы кэша.
+        """
+        for path in self.directory.glob("*/*.pdf"):
+            path.unlink(missing_ok=True)
+
+
+class ReceiptBackend:
+    """
+    Движок рендера PDF-чеков из HTML. Движок выбирается настройкой `RECEIPT_PDF_BACKEND`.
+    """
+    name = None
+
+    def is_available(self):
+        """
+        Проверяет, можно ли использовать движок в текущем окружении.
+        """
+        return True
+
+    def prepare(self):
+        """
+        Однократная подготовка движка в процессе (шрифты и т.п.).
+        """
+
+    def render(self, html):
+        """
+        Рендерит PDF из HTML чеков.
+
+        :raises ValueError: Если PDF сгенерировать не удалось
+        :return: Содержимое PDF
+        """
+        raise NotImplementedError
+
+
+class Xhtml2PdfBackend(ReceiptBackend):
+    """
+    Рендер через xhtml2pdf. Шрифт регистрируется в reportlab один раз на процесс.
+    """
+    name = "xhtml2pdf"
+
+    _fonts_lock = threading.Lock()
+    _fonts_registered = False
+
+    def prepare(self):
+        """
+        Регистрирует шрифт чеков в reportlab и xhtml2pdf один раз на процесс.
+        """
+        cls = type(self)
+        if cls._fonts_registered:
+            return
+        with cls._fonts_lock:
+            if cls._fonts_registered:
+                return
+            pdfmetrics.registerFont(TTFont(ReceiptService.FONT_NAME, ReceiptService.get_font_path()))
+            family = ReceiptService.FONT_NAME.lower()
+            for bold in (0, 1):
+                for italic in (0, 1):
+                    addMapping(family, bold, italic, ReceiptService.FONT_NAME)
+            pisa_default.DEFAULT_FONT[family] = ReceiptService.FONT_NAME
+            cls._fonts_registered = True
+
+    def render(self, html):
+        self.prepare()
+        dest = BytesIO()
+        status = pisa.CreatePDF(
+            src=html,
+            dest=dest,
+            encoding='utf-8',
+            link_callback=ReceiptService.link_callback,
+        )
+        if status.err:
+            raise ValueError("Ошибка при генерации PDF")
+        return dest.getvalue()
+
+
+class WeasyPrintBackend(ReceiptBackend):
+    """
+    Рендер через WeasyPrint. Библиотека импортируется при первом использовании:
+    ей нужны системные библиотеки Pango, которых может не быть на сервере.
+    Настройки шрифтов и таблица стилей со шрифтом чеков создаются один раз на поток.
+    """
+    name = "weasyprint"
+
+    _local = threading.local()
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def load():
+        """
+        Импортирует WeasyPrint.
+
+        :return: (модуль weasyprint или None, текст ошибки импорта)
+        """
+        try:
+            import weasyprint
+        except (ImportError, OSError) as e:
+            return None, str(e)
+        return weasyprint, None
+
+    def is_available(self):
+        return self.load()[0] is not None
+
+    def get_module(self):
+        """
+        :raises ValueError: Если WeasyPrint недоступен
+        """
+        weasyprint, error = self.load()
+        if weasyprint is None:
+            raise ValueError(f"WeasyPrint недоступен: {error}")
+        return weasyprint
+
+    def prepare(self):
+        """
+        Создаёт для текущего потока настройки шрифтов и таблицу стилей со шрифтом чеков.
+        """
+        if getattr(self._local, "stylesheet", None) is not None:
+            return
+        weasyprint = self.get_module()
+        from weasyprint.text.fonts import FontConfiguration
+
+        font_config = FontConfiguration()
+        font_url = Path(ReceiptService.get_font_path()).resolve().as_uri()
+        self._local.font_config = font_config
+        self._local.stylesheet = weasyprint.CSS(
+            string=f"@font-face {{ font-family: '{ReceiptService.FONT_NAME}'; src: url('{font_url}'); }}",
+            font_config=font_config,
+        )
+
+    @staticmethod
+    def url_fetcher(url, *args, **kwargs):
+        """
+        Загружает статику и медиа с диска, как link_callback у xhtml2pdf.
+        """
+        from weasyprint import default_url_fetcher
+
+        if url.startswith("file://"):
+            path = url[len("file://"):]
+            if path.startswith((settings.STATIC_URL, settings.MEDIA_URL)):
+                url = Path(ReceiptService.resolve_uri(path)).as_uri()
+        return default_url_fetcher(url, *args, **kwargs)
+
+    def render(self, html):
+        weasyprint = self.get_module()
+        self.prepare()
+        document = weasyprint.HTML(string=html, base_url="file:///", url_fetcher=self.url_fetcher)
+        return document.write_pdf(stylesheets=[self._local.stylesheet], font_config=self._local.font_config)
+
+
+RECEIPT_BACKENDS = {backend.name: backend() for backend in (Xhtml2PdfBackend, WeasyPrintBackend)}
+
+
+class ReceiptService:
+    """
+    Генерация PDF-чеков заказов. Движок рендера (xhtml2pdf или WeasyPrint)
+    выбирается настройкой `RECEIPT_PDF_BACKEND`, см. `RECEIPT_BACKENDS`.
+
+    Шрифт загружается один раз на процесс, пути к статике и медиа
+    кэшируются, шаблон компилируется один раз. Все чеки выборки рендерятся
+    за один проход (по чеку на страницу). Глобальное состояние меняется только
+    при первой подготовке движка под блокировкой, поэтому рендер безопасен
+    в многопоточных воркерах.
+
+    Большие выборки делятся на пачки по `RECEIPT_PDF_CHUNK_SIZE` заказов, которые
+    рендерятся в пуле из `RECEIPT_PDF_WORKERS` процессов и склеиваются через pypdf.
+
+    Если задан `RECEIPT_PDF_CACHE_DIR`, чек каждого заказа кэшируется на диске
+    (см. `ReceiptCache`): повторная печать заказа — в том числе в другой выборке —
+    отдаётся из файла, а рендерятся только отсутствующие в кэше чеки, за один проход.
+    """
+    TEMPLATE_NAME = "order_pdf_template.html"
+    # Увеличить при изменениях вывода чека, не затрагивающих шаблон и контекст
+    TEMPLATE_VERSION = 1
+    FONT_NAME = "DejaVuSans"
+    FONT_PATH = "admin/fonts/DejaVuSans.ttf"
+
+    CONTEXT = {
+        'company_name': "Перевозчик «Сауле – Марат»",
+        'contact_details': {
+            'almaty': {
+                'address': "Рынок «Salem», Ангарская 107",
+                'phone': "8778 869 5454, 8702 199 9507",
+            },
+            'astana': {
+                'address': "ул. Пушкина 35",
+                'working_hours': "9:00 - 14:00",
+            }
+        },
+        'notes': [
+            "Звонить через день после сдачи товара!",
+            "Выдача товара строго по квитанции!",
+            "Товар нужно забирать в день прибытия!",
+            "Хранение товара на складе платное!!!",
+            "Минимальная стоимость перевозки груза от 3000 тг",
+        ]
+    }
+
+    _executor_lock = threading.Lock()
+    _executor = None
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def resolve_uri(uri):
+        """
+        Преобразует URL статики или медиа в абсолютный путь к файлу.
+
+        :raises ValueError: Если URL не относится к статике/медиа или файл не существует
+        """
+        if uri.startswith(settings.MEDIA_URL):
+            root = os.path.abspath(settings.MEDIA_ROOT)
+            path = os.path.abspath(os.path.join(root, uri[len(settings.MEDIA_URL):]))
+            if not path.startswith(root + os.sep):
+                path = None
+        elif uri.startswith(settings.STATIC_URL):
+            path = finders.find(uri[len(settings.STATIC_URL):])
+            if path is None and settings.STATIC_ROOT:
+                path = os.path.join(settings.STATIC_ROOT, uri[len(settings.STATIC_URL):])
+        else:
+            path = uri
+
+        if not path or not os.path.isfile(path):
+            raise ValueError(f"URI должен начинаться с {settings.STATIC_URL} или {settings.MEDIA_URL}: {uri}")
+        return path
+
+    @staticmethod
+    def link_callback(uri, rel):
+        """
+        link_callback для xhtml2pdf: возвращает путь к файлу статики или медиа.
+        """
+        return ReceiptService.resolve_uri(uri)
+
+    @classmethod
+    def get_font_path(cls):
+        """
+        Возвращает путь к файлу шрифта чеков.
+        """
+        return cls.resolve_uri(settings.STATIC_URL + cls.FONT_PATH)
+
+    @staticmethod
+    def get_backend(name=None):
+        """
+        Возвращает движок рендера по имени (по умолчанию — из RECEIPT_PDF_BACKEND).
+
+        :raises ImproperlyConfigured: Если движок с таким именем не существует
+        """
+        name = name or getattr(settings, "RECEIPT_PDF_BACKEND", Xhtml2PdfBackend.name)
+        try:
+            return RECEIPT_BACKENDS[name]
+        except KeyError:
+            raise ImproperlyConfigured(
+                f"Неизвестный движок PDF-чеков {name!r}. Доступны: {', '.join(RECEIPT_BACKENDS)}."
+            )
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_template():
+        """
+        Возвращает скомпилированный шаблон чека.
+        """
+        return get_template(ReceiptService.TEMPLATE_NAME)
+
+    @staticmethod
+    def get_queryset(queryset):
+        """
+        Выборка заказов для чеков: маршрут и получатель загружаются JOIN'ом,
+        телефоны получателей (для `Client.__str__`) — одним дополнительным запросом.
+        """
+        return queryset.select_related("route", "receiver").prefetch_related("receiver__phone_numbers")
+
+    @classmethod
+    def render_html(cls, orders):
+        """
+        Рендерит HTML чеков: по одному чеку на заказ.
+        """
+        return cls.get_template().render({**cls.CONTEXT, 'orders': orders})
+
+    @classmethod
+    def html_to_pdf(cls, html, backend=None):
+        """
+        Рендерит PDF из готового HTML чеков.
+
+        :param backend: Имя движка рендера (по умолчанию — из настроек)
+        :raises ValueError: Если PDF сгенерировать не удалось
+        :return: Содержимое PDF
+        """
+        return cls.get_backend(backend).render(html)
+
+    @staticmethod
+    def merge_pdfs(documents):
+        """
+        Склеивает PDF-документы в один. Одинаковые объекты (копии шрифта в каждой
+        пачке) объединяются.
+        """
+        writer = PdfWriter()
+        for document in documents:
+            writer.append(PdfReader(BytesIO(document)))
+        writer.compress_identical_objects()
+        output = BytesIO()
+        writer.write(output)
+        return output.getvalue()
+
+    @staticmethod
+    def split_pages(document, count):
+        """
+        Делит PDF на документы по одной странице.
+
+        :return: Список документов или None, если страниц не `count`
+            (чек занял больше одной страницы)
+        """
+        reader = PdfReader(BytesIO(document))
+        if len(reader.pages) != count:
+            return None
+        pages = []
+        for page in reader.pages:
+            writer = PdfWriter()
+            writer.add_page(page)
+            writer.compress_identical_objects()
+            output = BytesIO()
+            writer.write(output)
+            pages.append(output.getvalue())
+        return pages
+
+    @classmethod
+    def get_executor(cls, workers):
+        """
+        Возвращает пул процессов для рендера. Пул создаётся один раз на процесс
+        (процессы запускаются через spawn, поэтому не наследуют потоки и соединения
+        с базой) и пересоздаётся при изменении числа процессов.
+        """
+        with cls._executor_lock:
+            if cls._executor is None or cls._executor._max_workers != workers:
+                if cls._executor is not None:
+                    cls._executor.shutdown(wait=False)
+                cls._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            return cls._executor
+
+    @classmethod
+    def reset_executor(cls):
+        """
+        Останавливает пул процессов (например, после падения процесса пула).
+        """
+        with cls._executor_lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=False, cancel_futures=True)
+                cls._executor = None
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_template_version():
+        """
+        Версия шаблона для ключей кэша: хэш исходника шаблона, общего контекста
+        и `TEMPLATE_VERSION`.
+        """
+        source = ReceiptService.get_template().template.source
+        payload = json.dumps([ReceiptService.TEMPLATE_VERSION, source, ReceiptService.CONTEXT], ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    @classmethod
+    def get_cache_key(cls, order, backend=None):
+        """
+        Ключ кэша чека: хэш полей заказа, которые выводятся в чеке, версии шаблона
+        и движка рендера.
+        """
+        fields = [
+            order.order_number,
+            order.route.unique_number if order.route_id else None,
+            str(order.receiver),
+            order.seat_count,
+            str(order.price),
+            order.date.isoformat() if order.date else None,
+            cls.get_template_version(),
+            cls.get_backend(backend).name,
+        ]
+        return hashlib.sha256(json.dumps(fields, ensure_ascii=False).encode()).hexdigest()
+
+    @staticmethod
+    def get_cache():
+        """
+        Возвращает кэш чеков или None, если кэш отключён.
+        """
+        directory = getattr(settings, "RECEIPT_PDF_CACHE_DIR", None)
+        if not directory:
+            return None
+        return ReceiptCache(
+            directory,
+            getattr(settings, "RECEIPT_PDF_CACHE_MAX_SIZE", 500 * 1024 * 1024),
+            getattr(settings, "RECEIPT_PDF_CACHE_EVICT_INTERVAL", 3600),
+        )
+
+    @classmethod
+    def render_pdf(cls, orders, workers=None, chunk_size=None, use_cache=True, backend=None):
+        """
+        Рендерит PDF с чеками заказов. Если заказов больше одной пачки и разрешено
+        несколько процессов, пачки рендерятся параллельно и склеиваются.
+        Если включён кэш, см. `render_cached_pdf`.
+
+        HTML всех пачек рендерится в текущем процессе (там же выполняются запросы
+        к базе), процессам пула передаётся только HTML.
+
+        :param orders: Заказы (выборка или список)
+        :param workers: Число процессов (по умолчанию RECEIPT_PDF_WORKERS)
+        :param chunk_size: Заказов в пачке (по умолчанию RECEIPT_PDF_CHUNK_SIZE)
+        :param use_cache: Использовать кэш чеков на диске, если он включён
+        :param backend: Имя движка рендера (по умолчанию RECEIPT_PDF_BACKEND)
+        :raises ValueError: Если PDF сгенерировать не удалось
+        :return: Содержимое PDF
+        """
+        workers = workers or getattr(settings, "RECEIPT_PDF_WORKERS", 1)
+        chunk_size = chunk_size or getattr(settings, "RECEIPT_PDF_CHUNK_SIZE", 25)
+
+        orders = list(orders)
+        cache = cls.get_cache() if use_cache and orders else None
+        if cache is not None:
+            return cls.render_cached_pdf(cache, orders, workers, chunk_size, backend=backend)
+
+        html_to_pdf = partial(cls.html_to_pdf, backend=backend)
+        if workers <= 1 or len(orders) <= chunk_size:
+            return html_to_pdf(cls.render_html(orders))
+
+        chunks = [
+            cls.render_html(orders[start:start + chunk_size])
+            for start in range(0, len(orders), chunk_size)
+        ]
+        try:
+            documents = list(cls.get_executor(workers).map(html_to_pdf, chunks))
+        except BrokenProcessPool:
+            cls.reset_executor()
+            documents = [html_to_pdf(html) for html in chunks]
+        return cls.merge_pdfs(documents)
+
+    @classmethod
+    def render_cached_pdf(cls, cache, orders, workers, chunk_size, backend=None):
+        """
+        Собирает PDF выборки из чеков заказов в кэше. Отсутствующие чеки рендерятся
+        одним проходом (с пулом процессов для больших выборок), делятся по страницам
+        и кэшируются под ключами своих заказов. Выборка склеивается `merge_pdfs`,
+        который объединяет одинаковые копии шрифта в чеках одного прохода.
+        """
+        keys = [cls.get_cache_key(order, backend) for order in orders]
+        pages = {key: cache.get(key) for key in keys}
+
+        missing = {}
+        for order, key in zip(orders, keys):
+            if pages[key] is None:
+                missing.setdefault(key, order)
+        if missing:
+            document = cls.render_pdf(list(missing.values()), workers, chunk_size, use_cache=False, backend=backend)
+            rendered = cls.split_pages(document, len(missing))
+            if rendered is None:
+                # Чек занял больше страницы — по заказам не делится, выборка не кэшируется
+                if len(missing) == len(orders):
+                    return document
+                return cls.render_pdf(orders, workers, chunk_size, use_cache=False, backend=backend)
+            for key, page in zip(missing, rendered):
+                cache.set(key, page)
+                pages[key] = page
+            cache.evict_if_due()
+
+        if len(keys) == 1:
+            return pages[keys[0]]
+        return cls.merge_pdfs([pages[key] for key in keys])
@@ -5,6 +5,24 @@ from .models import Order
 
 
 class OrderResource(resources.ModelResource):
+    @staticmethod
+    def get_export_queryset(queryset):
+        """
+        Подгружает всё, что используется при экспорте, фиксированным числом запросов:
+        получателя, полку и фуру маршрута — через JOIN, телефоны получателя — одним запросом.
+        """
+        return queryset.select_related(
+            'receiver', 'shelf', 'route__truck'
+        ).prefetch_related(
+            'receiver__phone_numbers'
+        )
+
+    def get_queryset(self):
+        return self.get_export_queryset(super().get_queryset())
+
+    def filter_export(self, queryset, **kwargs):
+        return self.get_export_queryset(super().filter_export(queryset, **kwargs))
+
     receiver_phone_numbers = fields.Field(column_name="Телефоны получателя")
 
     def dehydrate_receiver_phone_numbers(self, order):
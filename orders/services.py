@@ -1,34 +1,620 @@
-from django.db import transaction
+import csv
+import tempfile
+from functools import partial
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum, prefetch_related_objects
+from django.utils import timezone
+from openpyxl import Workbook
+from simple_history.utils import bulk_create_with_history
+
+from crm.models import Client, PhoneNumber
+from services.job_queue_service import JobQueueService
+from services.unique_number_service import UniqueNumberService
+from trucks.models import Route
 from warehouse.models import Shelf
-from orders.models import Order
+from orders.models import Order, OrderDailyStats
+from orders.resources import OrderResource
 
 class OrderShelfService:
+    # Результаты обработки отсканированного кода
+    FOUND = "found"
+    MISSING = "missing"
+    ALREADY_ON_SHELF = "already_on_shelf"
+    CONFLICT = "conflict"
+    # Заказы в этих статусах на полку не размещаются и возвращаются как конфликт
+    CLOSED_ORDER_STATUSES = ('completed', 'canceled')
+
+    @staticmethod
+    def normalize_code(code: str, prefix: str):
+        """
+        Убирает пробелы и префикс QR-кода ("O" — заказ, "W" — полка), если он есть.
+        """
+        code = str(code).strip()
+        return code[len(prefix):] if code.startswith(prefix) else code
+
+    @staticmethod
+    def get_shelf(shelf_unique_id: str):
+        """
+        Возвращает полку по уникальному идентификатору (с префиксом "W" или без).
+
+        :raises ValueError: Если полка не найдена
+        """
+        shelf_unique_id = OrderShelfService.normalize_code(shelf_unique_id, "W")
+        try:
+            return Shelf.objects.get(unique_id=shelf_unique_id)
+        except Shelf.DoesNotExist:
+            raise ValueError(f"Полка с уникальным идентификатором {shelf_unique_id} не найдена.")
+
     @staticmethod
     @transaction.atomic
-    def add_orders_to_shelf(order_numbers: list, shelf_unique_id: str):
+    def place_orders(order_numbers: list, shelf, user=None, scanned_at=None):
+        """
+        Размещает заказы на полке за фиксированное число запросов: заказы выбираются
+        одним запросом, полка и статус "На складе" выставляются одним UPDATE,
+        записи истории создаются одной пачкой.
+
+        Выданные и отменённые заказы не перемещаются и помечаются как конфликт —
+        с текущей полкой и статусом заказа. Так же помечаются заказы, изменённые
+        на сервере после сканирования, если передано время сканирования `scanned_at`
+        (сканы, накопленные без сети).
+
+        :param order_numbers: Номера заказов без префикса
+        :param shelf: Полка
+        :param user: Пользователь для записей истории (по умолчанию — из текущего запроса)
+        :param scanned_at: Время сканирования
+        :return: Словарь {номер заказа: {"status": FOUND / MISSING / ALREADY_ON_SHELF / CONFLICT, ...}}
+        """
+        orders = {
+            order.order_number: order
+            for order in Order.objects.select_for_update(of=("self",))
+            .select_related("shelf").filter(order_number__in=order_numbers)
+        }
+
+        results, to_place = {}, []
+        for order_number in order_numbers:
+            order = orders.get(order_number)
+            if order is None:
+                results[order_number] = {"status": OrderShelfService.MISSING}
+            elif order.shelf_id == shelf.pk and order.status == 'in_warehouse':
+                results[order_number] = {"status": OrderShelfService.ALREADY_ON_SHELF}
+            elif order.status in OrderShelfService.CLOSED_ORDER_STATUSES or (
+                scanned_at is not None and order.updated_at > scanned_at
+            ):
+                results[order_number] = {
+                    "status": OrderShelfService.CONFLICT,
+                    "current_shelf": order.shelf.unique_id if order.shelf else None,
+                    "order_status": order.status,
+                }
+            else:
+                results[order_number] = {"status": OrderShelfService.FOUND}
+                to_place.append(order)
+
+        if to_place:
+            now = timezone.now()
+            Order.objects.filter(pk__in=[order.pk for order in to_place]).update(
+                shelf=shelf, status='in_warehouse', updated_at=now
+            )
+            for order in to_place:
+                order.shelf = shelf
+                order.status = 'in_warehouse'
+                order.updated_at = now
+            Order.history.bulk_history_create(
+                to_place,
+                update=True,
+                default_user=user,
+                default_change_reason=f"Размещён на полке {shelf.unique_id}",
+                default_date=now,
+            )
+        return results
+
+    @staticmethod
+    @transaction.atomic
+    def add_orders_to_shelf(order_numbers: list, shelf_unique_id: str, user=None):
         """
         Добавляет все заказы с указанными номерами заказов на полку с заданным уникальным идентификатором.
 
         :param order_numbers: Список номеров заказов
         :param shelf_unique_id: Уникальный идентификатор полки
+        :param user: Пользователь для записей истории
         :raises ValueError: Если полка не найдена или заказы отсутствуют
+        :return: Сообщение о результате, включая ненайденные номера
         """
+        order_numbers = list(dict.fromkeys(
+            OrderShelfService.normalize_code(number, "O") for number in order_numbers if str(number).strip()
+        ))
         if not order_numbers:
             raise ValueError("Список номеров заказов пуст.")
 
+        shelf = OrderShelfService.get_shelf(shelf_unique_id)
+        results = OrderShelfService.place_orders(order_numbers, shelf, user=user)
+
+        missing = [number for number, result in results.items() if result["status"] == OrderShelfService.MISSING]
+        if len(missing) == len(order_numbers):
+            raise ValueError(f"Заказы с номерами {', '.join(order_numbers)} не найдены.")
+
+        conflicts = [number for number, result in results.items() if result["status"] == OrderShelfService.CONFLICT]
+        placed = [number for number in order_numbers if number not in missing and number not in conflicts]
+        message = (
+            f"Заказы с номерами {', '.join(placed)} успешно добавлены на полку {shelf.unique_id}."
+            if placed else f"Заказы не добавлены на полку {shelf.unique_id}."
+        )
+        if conflicts:
+            message += f" Выданы или отменены, не перемещены: {', '.join(conflicts)}."
+        if missing:
+            message += f" Не найдены: {', '.join(missing)}."
+        return message
+
+    @staticmethod
+    def place_scanned_orders(codes: list, shelf_unique_id: str, user=None, scanned_at=None):
+        """
+        Размещает отсканированные заказы на полке и возвращает результат по каждому коду.
+
+        :param codes: Отсканированные коды заказов (с префиксом "O" или без)
+        :param shelf_unique_id: Уникальный идентификатор полки (с префиксом "W" или без)
+        :param user: Пользователь для записей истории
+        :param scanned_at: Время сканирования (для сканов, накопленных без сети)
+        :raises ValueError: Если полка не найдена или коды отсутствуют
+        :return: Список словарей {"code", "order_number", "status"}
+        """
+        # Номер заказа -> код в том виде, в котором он был отсканирован
+        scanned_codes = {}
+        for code in codes:
+            if str(code).strip():
+                scanned_codes.setdefault(OrderShelfService.normalize_code(code, "O"), str(code).strip())
+        if not scanned_codes:
+            raise ValueError("Список номеров заказов пуст.")
+
+        shelf = OrderShelfService.get_shelf(shelf_unique_id)
+        results = OrderShelfService.place_orders(list(scanned_codes), shelf, user=user, scanned_at=scanned_at)
+        return [
+            {"code": code, "order_number": order_number, **results[order_number]}
+            for order_number, code in scanned_codes.items()
+        ]
+
+    @staticmethod
+    def ingest_scan_batch(batch_id: str, codes: list, shelf_unique_id: str, user=None, scanned_at=None):
+        """
+        Идемпотентно обрабатывает пачку сканов: пачка с уже известным `batch_id`
+        не обрабатывается повторно, возвращается сохранённый ответ.
+
+        :param batch_id: Идентификатор пачки, сгенерированный клиентом
+        :param codes: Отсканированные коды заказов
+        :param shelf_unique_id: Уникальный идентификатор полки
+        :param user: Пользователь, отправивший пачку
+        :param scanned_at: Время сканирования (для сканов, накопленных без сети)
+        :raises ValueError: Если полка не найдена или коды отсутствуют
+        :return: (ответ, True если пачка уже была обработана)
+        """
+        scan_batch_model = apps.get_model("qr_handler", "ScanBatch")
+        scan_batch = scan_batch_model.objects.filter(batch_id=batch_id).first()
+        if scan_batch:
+            return scan_batch.response, True
+
         try:
-            # Получаем полку по уникальному идентификатору
-            shelf = Shelf.objects.get(unique_id=shelf_unique_id)
-        except Shelf.DoesNotExist:
-            raise ValueError(f"Полка с уникальным идентификатором {shelf_unique_id} не найдена.")
+            with transaction.atomic():
+                results = OrderShelfService.place_scanned_orders(
+                    codes, shelf_unique_id, user=user, scanned_at=scanned_at
+                )
+                response = {
+                    "batch_id": batch_id,
+                    "shelf": OrderShelfService.normalize_code(shelf_unique_id, "W"),
+                    "results": results,
+                }
+                scan_batch_model.objects.create(
+                    batch_id=batch_id,
+                    shelf_unique_id=response["shelf"],
+                    user=user,
+                    response=response,
+                )
+        except IntegrityError:
+            # Пачку параллельно обработал другой запрос — возвращаем его ответ
+            return scan_batch_model.objects.get(batch_id=batch_id).response, True
+        return response, False
+
+
+class OrderIntakeService:
+    @staticmethod
+    @transaction.atomic
+    def bulk_create_orders(orders: list, user=None):
+        """
+        Создаёт пачку заказов за фиксированное число запросов: номера резервируются одним
+        запросом, заказы и записи истории вставляются через bulk_create, а задачи генерации
+        QR-кодов ставятся в очередь одной пачкой.
+
+        :param orders: Список несохранённых экземпляров Order
+        :param user: Пользователь, от имени которого создаётся история
+        :raises ValueError: Если список заказов пуст
+        :return: Список созданных заказов
+        """
+        if not orders:
+            raise ValueError("Список заказов пуст.")
+
+        order_numbers = UniqueNumberService.generate_unique_numbers(Order, len(orders))
+        for order, order_number in zip(orders, order_numbers):
+            order.order_number = order_number
+            if order.status == 'completed':
+                order.shelf = None
+
+        # Телефоны клиентов загружаются одним запросом для построения поискового индекса
+        prefetch_related_objects(
+            [client for order in orders for client in (order.sender, order.receiver)],
+            'phone_numbers',
+        )
+        for order in orders:
+            order.search_document = order.build_search_document()
+
+        created_orders = bulk_create_with_history(orders, Order, default_user=user)
+        JobQueueService.enqueue_many("orders.generate_qr_code", created_orders)
+
+        return created_orders
+
+
+class OrderSearchService:
+    """
+    Поиск заказов по денормализованному полю `search_document`.
+
+    На PostgreSQL по полю строится GIN-индекс pg_trgm (см. `create_search_index`),
+    поэтому поиск подстроки не требует последовательного сканирования и DISTINCT.
+    На других базах (SQLite в тестах) выполняется обычный LIKE по тому же полю.
+    """
+    INDEX_NAME = "orders_order_search_trgm"
+    REFRESH_TASK = "orders.refresh_search"
+
+    @staticmethod
+    def search(queryset, search_term):
+        """
+        Фильтрует заказы: каждое слово запроса должно встречаться в поисковом индексе
+        либо совпадать с номером маршрута или ID полки. Слова, похожие на телефон,
+        дополнительно ищутся по нормализованному индексу номеров клиентов.
+
+        :param queryset: Исходная выборка заказов
+        :param search_term: Строка поиска
+        :return: Отфильтрованная выборка
+        """
+        for word in search_term.split():
+            condition = (
+                Q(search_document__contains=word.lower())
+                | Q(route__in=Route.objects.filter(unique_number__iexact=word).values('pk'))
+                | Q(shelf__in=Shelf.objects.filter(unique_id__iexact=word).values('pk'))
+            )
+            if PhoneNumber.is_phone_query(word):
+                client_ids = PhoneNumber.objects.matching(word).values('client_id')
+                condition |= Q(sender__in=client_ids) | Q(receiver__in=client_ids)
+            queryset = queryset.filter(condition)
+        return queryset
+
+    @staticmethod
+    def refresh(queryset, batch_size=1000):
+        """
+        Пересчитывает поисковый индекс у заказов выборки пачками.
+
+        :param queryset: Выборка заказов
+        :param batch_size: Размер пачки
+        :return: Количество обновлённых заказов
+        """
+        orders = (
+            queryset.order_by()
+            .select_related('sender', 'receiver')
+            .prefetch_related('sender__phone_numbers', 'receiver__phone_numbers')
+            .only('pk', 'order_number', 'search_document', 'sender__full_name', 'receiver__full_name')
+        )
+        batch, updated = [], 0
+        for order in orders.iterator(chunk_size=batch_size):
+            document = order.build_search_document()
+            if document != order.search_document:
+                order.search_document = document
+                batch.append(order)
+            if len(batch) >= batch_size:
+                updated += Order.objects.bulk_update(batch, ['search_document'])
+                batch = []
+        if batch:
+            updated += Order.objects.bulk_update(batch, ['search_document'])
+        return updated
+
+    @staticmethod
+    def refresh_for_client(client_id):
+        """
+        Пересчитывает поисковый индекс заказов, где клиент является отправителем или получателем.
+        """
+        return OrderSearchService.refresh(Order.objects.filter(Q(sender_id=client_id) | Q(receiver_id=client_id)))
+
+    @staticmethod
+    def _enqueue_refresh(client_ids):
+        """
+        Ставит в очередь пересчёт поискового индекса заказов клиентов,
+        для которых такая задача ещё не ожидает выполнения.
+        """
+        job_model = apps.get_model("qr_handler", "BackgroundJob")
+        queued = job_model.objects.filter(
+            task=OrderSearchService.REFRESH_TASK, status=job_model.PENDING, object_id__in=client_ids,
+        ).values('object_id')
+        clients = Client.objects.filter(pk__in=client_ids).exclude(pk__in=queued)
+        JobQueueService.enqueue_many(OrderSearchService.REFRESH_TASK, clients)
 
-        # Получаем заказы с указанными номерами
-        orders = Order.objects.filter(order_number__in=order_numbers)
+    @staticmethod
+    def schedule_refresh_for_client(client_id):
+        """
+        Планирует пересчёт поискового индекса заказов клиента после фиксации транзакции.
+        Повторные вызовы в одной транзакции (сохранение клиента и его телефонов
+        в админке) дают одну фоновую задачу на клиента: задача не ставится,
+        если для клиента уже есть ожидающая.
+        """
+        transaction.on_commit(partial(OrderSearchService._enqueue_refresh, [client_id]))
+
+    @classmethod
+    def create_search_index(cls, connection):
+        """
+        Создаёт триграммный GIN-индекс по полю `search_document` на PostgreSQL.
+        Для остальных баз ничего не делает.
+        """
+        if connection.vendor != 'postgresql':
+            return
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {cls.INDEX_NAME} ON {Order._meta.db_table} "
+                f"USING gin (search_document gin_trgm_ops)"
+            )
+
+
+class QRLookupService:
+    """
+    Быстрый просмотр заказа или полки по QR-коду без загрузки формы админки:
+    каждый код разрешается одним запросом по уникальному индексу.
+    """
+
+    @staticmethod
+    def format_location(row, prefix=""):
+        """
+        Собирает расположение полки из денормализованных полей.
+        """
+        parts = [row[f"{prefix}warehouse_name"], row[f"{prefix}area_name"], row[f"{prefix}sector_name"]]
+        return " / ".join(part for part in parts if part)
+
+    @staticmethod
+    def resolve_order(order_number):
+        """
+        Возвращает краткую информацию о заказе: статус, полку, получателя и долг.
+        Первый телефон получателя выбирается подзапросом в том же запросе.
+
+        :param order_number: Номер заказа (с префиксом "O" или без)
+        :return: Словарь с информацией о заказе или None, если заказ не найден
+        """
+        order_number = OrderShelfService.normalize_code(order_number, "O")
+        first_phone = PhoneNumber.objects.filter(client=OuterRef("receiver_id")).order_by("pk").values("number")[:1]
+        row = (
+            Order.objects.filter(order_number=order_number)
+            .annotate(receiver_phone=Subquery(first_phone))
+            .values(
+                "pk", "order_number", "status", "seat_count", "price", "paid_amount", "is_cashless",
+                "receiver__full_name", "receiver_phone", "route__unique_number",
+                "shelf__unique_id", "shelf__surface", "shelf__warehouse_name", "shelf__area_name",
+                "shelf__sector_name",
+            )
+            .first()
+        )
+        if row is None:
+            return None
+
+        return {
+            "type": "order",
+            "id": row["pk"],
+            "order_number": row["order_number"],
+            "status": row["status"],
+            "status_display": dict(Order.STATUS_CHOICES).get(row["status"], row["status"]),
+            "seat_count": row["seat_count"],
+            "price": str(row["price"]),
+            "paid_amount": str(row["paid_amount"]),
+            "debt": str(row["price"] - row["paid_amount"]),
+            "is_cashless": row["is_cashless"],
+            "receiver": {
+                "full_name": row["receiver__full_name"],
+                "phone": row["receiver_phone"],
+            },
+            "route": row["route__unique_number"],
+            "shelf": {
+                "unique_id": row["shelf__unique_id"],
+                "surface": dict(Shelf.SURFACE_CHOICES).get(row["shelf__surface"], row["shelf__surface"]),
+                "location": QRLookupService.format_location(row, prefix="shelf__"),
+            } if row["shelf__unique_id"] else None,
+        }
+
+    @staticmethod
+    def resolve_shelf(shelf_unique_id):
+        """
+        Возвращает расположение полки и количество заказов на ней.
+
+        :param shelf_unique_id: Уникальный ID полки (с префиксом "W" или без)
+        :return: Словарь с информацией о полке или None, если полка не найдена
+        """
+        shelf_unique_id = OrderShelfService.normalize_code(shelf_unique_id, "W")
+        row = (
+            Shelf.objects.filter(unique_id=shelf_unique_id)
+            .annotate(orders_count=Count("orders"))
+            .values("pk", "unique_id", "surface", "warehouse_name", "area_name", "sector_name", "orders_count")
+            .first()
+        )
+        if row is None:
+            return None
+
+        return {
+            "type": "shelf",
+            "id": row["pk"],
+            "unique_id": row["unique_id"],
+            "surface": dict(Shelf.SURFACE_CHOICES).get(row["surface"], row["surface"]),
+            "location": QRLookupService.format_location(row),
+            "orders_count": row["orders_count"],
+        }
+
+    @staticmethod
+    def resolve(code):
+        """
+        Разрешает QR-код: "O…" — заказ, "W…" — полка.
+
+        :raises ValueError: Если код имеет неверный формат или объект не найден
+        """
+        code = str(code or "").strip()
+        if code.startswith("O"):
+            result = QRLookupService.resolve_order(code)
+            if result is None:
+                raise ValueError(f"Не удалось найти заказ с номером {code[1:]}.")
+        elif code.startswith("W"):
+            result = QRLookupService.resolve_shelf(code)
+            if result is None:
+                raise ValueError(f"Не удалось найти полку с ID {code[1:]}.")
+        else:
+            raise ValueError("Введите значение, начинающееся с 'O' или 'W'.")
+        return result
+
+
+class _EchoBuffer:
+    """
+    Псевдо-буфер для csv.writer: возвращает записанную строку вместо хранения.
+    """
+
+    def write(self, value):
+        return value
+
+
+class OrderExportService:
+    """
+    Потоковый экспорт заказов: строки читаются из базы частями и сразу
+    записываются в ответ, поэтому расход памяти не зависит от объёма выборки.
+    """
+
+    @staticmethod
+    def get_chunk_size():
+        return getattr(settings, "ORDER_EXPORT_CHUNK_SIZE", 2000)
+
+    @staticmethod
+    def iter_rows(queryset, resource=None):
+        """
+        Возвращает заголовки и строки экспорта по одной, используя поля OrderResource.
+
+        :param queryset: Выборка заказов
+        :param resource: Ресурс экспорта (по умолчанию OrderResource)
+        """
+        resource = resource or OrderResource()
+        export_fields = resource.get_export_fields()
+        queryset = resource.get_export_queryset(queryset)
+        yield resource.get_export_headers()
+        for order in queryset.iterator(chunk_size=OrderExportService.get_chunk_size()):
+            yield [resource.export_field(field, order) for field in export_fields]
+
+    @staticmethod
+    def stream_csv(queryset):
+        """
+        Генерирует CSV построчно (с BOM, чтобы Excel корректно открыл кириллицу).
 
-        if not orders.exists():
-            raise ValueError(f"Заказы с номерами {order_numbers} не найдены.")
+        :param queryset: Выборка заказов
+        """
+        writer = csv.writer(_EchoBuffer())
+        yield "\ufeff"
+        for row in OrderExportService.iter_rows(queryset):
+            yield writer.writerow(row)
 
-        # Обновляем поле `shelf` у всех выбранных заказов
-        orders.update(shelf=shelf)
+    @staticmethod
+    def write_xlsx(queryset):
+        """
+        Записывает XLSX в режиме write-only во временный файл на диске.
+        Формат XLSX — zip-архив, поэтому отдать его можно только после записи,
+        но строки не накапливаются в памяти.
 
-        return f"Заказы с номерами {', '.join(order_numbers)} успешно добавлены на полку {shelf.unique_id}."
+        :param queryset: Выборка заказов
+        :return: Временный файл, установленный на начало
+        """
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Заказы")
+        for row in OrderExportService.iter_rows(queryset):
+            sheet.append(row)
+
+        output = tempfile.TemporaryFile()
+        workbook.save(output)
+        output.seek(0)
+        return output
+
+
+class OrderStatsService:
+    """
+    Показатели заказов для дашборда и других представлений.
+    Считаются условной агрегацией по таблице OrderDailyStats — один запрос на группу показателей.
+    Готовые показатели кэшируются на DASHBOARD_CACHE_TIMEOUT секунд и сбрасываются
+    при изменении заказов.
+    """
+    CACHE_KEY = "orders:stats:{day}"
+
+    @staticmethod
+    def get_cache_key():
+        # Дата в ключе, чтобы недельные окна сдвигались в полночь
+        return OrderStatsService.CACHE_KEY.format(day=timezone.now().date().isoformat())
+
+    @staticmethod
+    def get_cached(compute):
+        """
+        Возвращает показатели из кэша или вычисляет и кэширует их.
+
+        :param compute: Функция без аргументов, вычисляющая показатели
+        """
+        return cache.get_or_set(
+            OrderStatsService.get_cache_key(),
+            compute,
+            getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 300),
+        )
+
+    @staticmethod
+    def invalidate_cache():
+        """
+        Сбрасывает кэш показателей после фиксации текущей транзакции.
+        """
+        transaction.on_commit(lambda: cache.delete(OrderStatsService.get_cache_key()))
+
+    @staticmethod
+    def get_period_counts(periods: dict, statuses=None):
+        """
+        Возвращает количество заказов по статусам за несколько периодов одним запросом.
+
+        :param periods: Словарь {название: (дата начала, дата окончания)}, границы включительно
+        :param statuses: Список статусов (по умолчанию все статусы заказа)
+        :return: Словарь {название: {статус: количество}}
+        """
+        statuses = statuses or [status for status, _ in Order.STATUS_CHOICES]
+        if not periods:
+            return {}
+
+        aggregates = {
+            f"{name}_{status}": Sum(
+                "orders_count",
+                filter=Q(day__gte=start_date, day__lte=end_date, status=status),
+            )
+            for name, (start_date, end_date) in periods.items()
+            for status in statuses
+        }
+        window_start = min(start_date for start_date, _ in periods.values())
+        window_end = max(end_date for _, end_date in periods.values())
+        result = OrderDailyStats.objects.filter(day__gte=window_start, day__lte=window_end).aggregate(**aggregates)
+
+        return {
+            name: {status: result[f"{name}_{status}"] or 0 for status in statuses}
+            for name in periods
+        }
+
+    @staticmethod
+    def get_totals():
+        """
+        Возвращает показатели за всё время одним запросом.
+
+        :return: Словарь с общим количеством заказов, количеством безналичных заказов,
+                 количеством, суммой оплат и суммой цен заказов на складе
+        """
+        totals = OrderDailyStats.objects.aggregate(
+            total_orders=Sum("orders_count"),
+            total_cashless_orders=Sum("orders_count", filter=Q(is_cashless=True)),
+            total_items_in_warehouse=Sum("orders_count", filter=Q(status="in_warehouse")),
+            total_paid=Sum("paid_sum", filter=Q(status="in_warehouse")),
+            total_price=Sum("price_sum", filter=Q(status="in_warehouse")),
+        )
+        return {key: value or 0 for key, value in totals.items()}
@@ -0,0 +1,92 @@
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from crm.models import Client, PhoneNumber
+from .models import Order, OrderDailyStats
+from .services import OrderSearchService, OrderStatsService
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_stats_snapshot(sender, instance, raw=False, **kwargs):
+    """
+    Если объект создан не из базы (или с отложенными полями), читаем старые значения перед сохранением.
+    """
+    if raw or instance.pk is None or hasattr(instance, "_stats_snapshot"):
+        return
+    old_instance = Order.objects.filter(pk=instance.pk).only(*Order.STATS_FIELDS).first()
+    instance._stats_snapshot = old_instance.get_stats_snapshot() if old_instance else None
+
+
+@receiver(post_save, sender=Order)
+def update_order_daily_stats(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    Применяет изменение заказа к таблице дневной статистики и сбрасывает кэш показателей.
+    """
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & set(Order.STATS_FIELDS):
+        return
+    old_snapshot = None if created else getattr(instance, "_stats_snapshot", None)
+    new_snapshot = instance.get_stats_snapshot()
+    if old_snapshot != new_snapshot:
+        OrderDailyStats.apply_change(old_snapshot, new_snapshot)
+        OrderStatsService.invalidate_cache()
+    instance._stats_snapshot = new_snapshot
+
+
+@receiver(post_delete, sender=Order)
+def remove_order_from_daily_stats(sender, instance, **kwargs):
+    """
+    Вычитает удалённый заказ из таблицы дневной статистики и сбрасывает кэш показателей.
+    """
+    OrderDailyStats.apply_change(getattr(instance, "_stats_snapshot", instance.get_stats_snapshot()), None)
+    OrderStatsService.invalidate_cache()
+
+
+@receiver(post_save, sender=Client)
+def refresh_search_on_client_change(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    Планирует обновление поискового индекса заказов клиента при изменении ФИО.
+    """
+    if raw or created:
+        return
+    if update_fields is not None and 'full_name' not in update_fields:
+        return
+    if instance.full_name_changed():
+        OrderSearchService.schedule_refresh_for_client(instance.pk)
+    instance._loaded_full_name = instance.full_name
+
+
+@receiver(post_save, sender=PhoneNumber)
+def refresh_search_on_phone_change(sender, instance, created, raw=False, **kwargs):
+    """
+    Планирует обновление поискового индекса заказов клиента при добавлении телефона,
+    изменении номера или переносе телефона к другому клиенту.
+    """
+    if raw:
+        return
+    loaded_client_id = getattr(instance, '_loaded_client_id', None)
+    if created or getattr(instance, '_loaded_number', None) != instance.number or loaded_client_id != instance.client_id:
+        OrderSearchService.schedule_refresh_for_client(instance.client_id)
+        if loaded_client_id and loaded_client_id != instance.client_id:
+            OrderSearchService.schedule_refresh_for_client(loaded_client_id)
+    instance._loaded_number = instance.number
+    instance._loaded_client_id = instance.client_id
+
+
+@receiver(post_delete, sender=PhoneNumber)
+def refresh_search_on_phone_delete(sender, instance, **kwargs):
+    """
+    Планирует обновление поискового индекса заказов клиента при удалении телефона.
+    """
+    OrderSearchService.schedule_refresh_for_client(instance.client_id)
+
+
+@receiver(post_migrate)
+def create_order_search_index(sender, using="default", **kwargs):
+    """
+    Миграций в проекте нет, поэтому триграммный индекс создаётся после migrate.
+    """
+    if sender.name == 'orders':
+        OrderSearchService.create_search_index(connections[using])
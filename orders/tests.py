@@ -1,3 +1,402 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from pypdf import PdfReader
+
+from crm.models import Client, PhoneNumber
+from trucks.models import Truck, Route
+from warehouse.models import Warehouse, Area, Sector, Shelf
+from services.unique_number_service import UniqueNumberService
+from .models import DailySequence, Order, OrderDailyStats
+from .receipts import ReceiptService
+from .resources import OrderResource
+from qr_handler.models import BackgroundJob
+from .services import OrderExportService, OrderSearchService, OrderShelfService
+
+
+class OrderQueriesTestMixin:
+    """
+    Создание заказов со связанными клиентами, телефонами, маршрутами и полками.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        warehouse = Warehouse.objects.create(name="Склад")
+        area = Area.objects.create(warehouse=warehouse, name="Область")
+        cls.sector = Sector.objects.create(area=area, name="Сектор")
+
+    def create_orders(self, count):
+        orders = []
+        start = Order.objects.count()
+        for index in range(start, start + count):
+            sender = Client.objects.create(full_name=f"Отправитель {index}")
+            receiver = Client.objects.create(full_name=f"Получатель {index}")
+            PhoneNumber.objects.create(client=sender, number=f"+7701{index:07d}")
+            PhoneNumber.objects.create(client=receiver, number=f"+7702{index:07d}")
+            PhoneNumber.objects.create(client=receiver, number=f"+7703{index:07d}")
+            truck = Truck.objects.create(name=f"Фура {index}", plate_number=f"{index:03d}ABC")
+            route = Route.objects.create(truck=truck, status="loading", unique_number=f"R-{index}")
+            shelf = Shelf.objects.create(sector=self.sector, surface=Shelf.LOWER)
+            orders.append(Order.objects.create(
+                sender=sender, receiver=receiver, route=route, shelf=shelf,
+                seat_count=1, price=1000, paid_amount=500,
+            ))
+        return orders
+
+
+class OrderExportQueriesTest(OrderQueriesTestMixin, TestCase):
+    """
+    Экспорт заказов выполняет фиксированное число запросов независимо от размера выборки.
+    """
+
+    def count_export_queries(self, export):
+        with CaptureQueriesContext(connection) as context:
+            export()
+        return len(context.captured_queries)
+
+    def test_resource_export_query_count_is_constant(self):
+        self.create_orders(1)
+        single = self.count_export_queries(lambda: OrderResource().export(Order.objects.all()))
+
+        self.create_orders(9)
+        many = self.count_export_queries(lambda: OrderResource().export(Order.objects.all()))
+
+        self.assertEqual(single, many)
+
+    def test_streaming_export_query_count_is_constant(self):
+        self.create_orders(1)
+        single = self.count_export_queries(lambda: list(OrderExportService.iter_rows(Order.objects.all())))
+
+        self.create_orders(9)
+        many = self.count_export_queries(lambda: list(OrderExportService.iter_rows(Order.objects.all())))
+
+        self.assertEqual(single, many)
+
+    def test_export_contains_related_values(self):
+        order = self.create_orders(1)[0]
+        dataset = OrderResource().export(Order.objects.all())
+
+        row = dict(zip(dataset.headers, dataset[0]))
+        self.assertEqual(row["Телефоны получателя"], order.receiver.get_phone_numbers())
+        self.assertEqual(row["Номер машины"], order.route.truck.plate_number)
+        self.assertEqual(row["ID полки"], order.shelf.unique_id)
+
+
+class ReceiptQueriesTest(OrderQueriesTestMixin, TestCase):
+    """
+    Данные для чеков загружаются фиксированным числом запросов независимо от размера выборки.
+    """
+
+    def count_render_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            html = ReceiptService.render_html(list(ReceiptService.get_queryset(Order.objects.all())))
+        return len(context.captured_queries), html
+
+    def test_render_query_count_is_constant(self):
+        self.create_orders(1)
+        single, _ = self.count_render_queries()
+
+        self.create_orders(9)
+        many, _ = self.count_render_queries()
+
+        self.assertEqual(single, 2)
+        self.assertEqual(single, many)
+
+    def test_receipt_contains_related_values(self):
+        order = self.create_orders(1)[0]
+        _, html = self.count_render_queries()
+
+        self.assertIn(order.route.unique_number, html)
+        self.assertIn(str(order.receiver), html)
+
+
+class ReceiptCacheTest(OrderQueriesTestMixin, TestCase):
+    """
+    Кэш чеков по заказам: повторная печать заказа из другой выборки не рендерит его заново.
+    """
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        settings_override = override_settings(RECEIPT_PDF_CACHE_DIR=cache_dir.name, RECEIPT_PDF_WORKERS=1)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.orders = self.create_orders(3)
+
+    def render(self, orders):
+        """
+        Рендерит чеки и возвращает (PDF, число заказов, отрендеренных заново).
+        """
+        orders = list(ReceiptService.get_queryset(Order.objects.filter(pk__in=[order.pk for order in orders])))
+        with patch.object(ReceiptService, "render_html", wraps=ReceiptService.render_html) as render_html:
+            pdf = ReceiptService.render_pdf(orders)
+        rendered = sum(len(call.args[0]) for call in render_html.call_args_list)
+        return PdfReader(BytesIO(pdf)), rendered
+
+    def test_selection_is_assembled_from_cached_orders(self):
+        first, rendered = self.render(self.orders)
+        self.assertEqual((len(first.pages), rendered), (3, 3))
+
+        single, rendered = self.render(self.orders[1:2])
+        self.assertEqual((len(single.pages), rendered), (1, 0))
+        self.assertIn(self.orders[1].order_number, single.pages[0].extract_text())
+
+        again, rendered = self.render(self.orders)
+        self.assertEqual((len(again.pages), rendered), (3, 0))
+
+    def test_only_changed_orders_are_rendered(self):
+        self.render(self.orders)
+        Order.objects.filter(pk=self.orders[0].pk).update(seat_count=5)
+
+        pdf, rendered = self.render(self.orders)
+
+        self.assertEqual((len(pdf.pages), rendered), (3, 1))
+
+
+class OrderSearchServiceTest(OrderQueriesTestMixin, TestCase):
+    """
+    Поиск заказов по поисковому индексу, телефонам, номеру маршрута и ID полки.
+    """
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order, self.other = self.create_orders(2)
+            Client.objects.filter(pk=self.order.receiver_id).update(full_name="Айгерим Сапарова")
+        OrderSearchService.refresh(Order.objects.all())
+        BackgroundJob.objects.all().delete()
+
+    def search(self, term):
+        return list(OrderSearchService.search(Order.objects.all(), term))
+
+    def test_search_by_name(self):
+        self.assertEqual(self.search("Айгерим"), [self.order])
+        self.assertEqual(self.search("Сапарова Айгерим"), [self.order])
+        self.assertEqual(self.search(self.order.order_number), [self.order])
+
+    def test_search_by_phone_suffix(self):
+        self.assertEqual(self.search("0000001"), [self.other])
+        self.assertEqual(self.search("87030000000"), [self.order])
+
+    def test_search_by_route_number(self):
+        self.assertEqual(self.search(self.other.route.unique_number), [self.other])
+
+    def test_search_by_shelf_id(self):
+        self.assertEqual(self.search(self.order.shelf.unique_id.lower()), [self.order])
+
+    @override_settings(BACKGROUND_JOBS_EAGER=True)
+    def test_client_rename_refreshes_search(self):
+        receiver = Client.objects.get(pk=self.order.receiver_id)
+        receiver.full_name = "Новое имя"
+        with self.captureOnCommitCallbacks(execute=True):
+            receiver.save()
+
+        self.assertEqual(self.search("Новое"), [self.order])
+        self.assertEqual(self.search("Айгерим"), [])
+
+    def test_client_and_phones_saved_together_enqueue_one_refresh(self):
+        receiver = Client.objects.get(pk=self.order.receiver_id)
+        receiver.full_name = "Новое имя"
+        with self.captureOnCommitCallbacks(execute=True):
+            receiver.save()
+            for phone in receiver.phone_numbers.all():
+                phone.number = phone.number.replace("+7", "8")
+                phone.save()
+            PhoneNumber.objects.create(client=receiver, number="+77779999999")
+
+        jobs = BackgroundJob.objects.filter(task=OrderSearchService.REFRESH_TASK)
+        self.assertEqual(list(jobs.values_list("object_id", flat=True)), [receiver.pk])
+
+    def test_unchanged_client_save_does_not_enqueue_refresh(self):
+        receiver = Client.objects.get(pk=self.order.receiver_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            receiver.save()
+            receiver.phone_numbers.first().save()
+
+        self.assertFalse(BackgroundJob.objects.filter(task=OrderSearchService.REFRESH_TASK).exists())
+
+
+class OrderDailyStatsTest(OrderQueriesTestMixin, TestCase):
+    """
+    Инкрементальная статистика по дням совпадает с полным пересчётом после любого изменения заказов.
+    """
+
+    def setUp(self):
+        self.orders = self.create_orders(3)
+        # Заказы за разные дни
+        for days, order in enumerate(self.orders):
+            Order.objects.filter(pk=order.pk).update(date=timezone.now() - timedelta(days=days))
+
+    def get_stats(self):
+        return {
+            (row.day, row.status, row.is_cashless): (row.orders_count, row.price_sum, row.paid_sum)
+            for row in OrderDailyStats.objects.all()
+            if row.orders_count or row.price_sum or row.paid_sum
+        }
+
+    def assertStatsMatchRebuild(self):
+        stats = self.get_stats()
+        OrderDailyStats.rebuild()
+        self.assertEqual(stats, self.get_stats())
+        self.assertTrue(stats)
+
+    def test_save(self):
+        order = Order.objects.get(pk=self.orders[0].pk)
+        order.price = 2500
+        order.status = "completed"
+        order.save()
+
+        self.assertStatsMatchRebuild()
+
+    def test_delete(self):
+        Order.objects.get(pk=self.orders[1].pk).delete()
+
+        self.assertStatsMatchRebuild()
+
+    def test_queryset_update(self):
+        Order.objects.all().update(status="in_warehouse", is_cashless=True)
+
+        self.assertStatsMatchRebuild()
+
+    def test_bulk_create(self):
+        order = self.orders[0]
+        Order.objects.bulk_create([
+            Order(
+                order_number=f"T-{index}", sender=order.sender, receiver=order.receiver,
+                seat_count=1, price=700, paid_amount=100,
+            )
+            for index in range(3)
+        ])
+
+        self.assertStatsMatchRebuild()
+
+    def test_route_cascade(self):
+        route = Route.objects.get(pk=self.orders[2].route_id)
+        route.status = "on_way"
+        route.save()
+
+        self.assertEqual(Order.objects.get(pk=self.orders[2].pk).status, "in_transit")
+        self.assertStatsMatchRebuild()
+
+    def test_update_query_count_does_not_depend_on_days(self):
+        with CaptureQueriesContext(connection) as one_day:
+            Order.objects.filter(pk=self.orders[0].pk).update(status="in_warehouse")
+        with CaptureQueriesContext(connection) as many_days:
+            Order.objects.all().update(status="completed")
+
+        self.assertEqual(len(one_day.captured_queries), len(many_days.captured_queries))
+        self.assertStatsMatchRebuild()
+
+
+class OrderShelfServiceTest(OrderQueriesTestMixin, TestCase):
+    """
+    Размещение заказов на полке пачкой.
+    """
+
+    def setUp(self):
+        self.shelf = Shelf.objects.create(sector=self.sector, surface=Shelf.UPPER)
+        self.order = self.create_orders(1)[0]
+
+    def create_batch(self, count, days):
+        """
+        Создаёт `count` заказов, распределённых по `days` дням.
+        """
+        Order.objects.bulk_create([
+            Order(
+                order_number=f"B{days}-{index:04d}", sender=self.order.sender, receiver=self.order.receiver,
+                seat_count=1, price=1000, paid_amount=0,
+            )
+            for index in range(count)
+        ])
+        orders = list(Order.objects.filter(order_number__startswith=f"B{days}-"))
+        for day in range(days):
+            Order.objects.filter(pk__in=[order.pk for order in orders[day::days]]).update(
+                date=timezone.now() - timedelta(days=day)
+            )
+        return [order.order_number for order in orders]
+
+    def count_place_queries(self, order_numbers):
+        with CaptureQueriesContext(connection) as context:
+            OrderShelfService.place_orders(order_numbers, self.shelf)
+        return len(context.captured_queries)
+
+    def test_query_count_is_constant(self):
+        # Размер пачек не превышает одной вставки истории на SQLite
+        single_day = self.count_place_queries(self.create_batch(2, days=1))
+        many_days = self.count_place_queries(self.create_batch(30, days=10))
+
+        self.assertEqual(single_day, many_days)
+        self.assertEqual(Order.objects.filter(shelf=self.shelf, status="in_warehouse").count(), 32)
+
+    def test_closed_orders_are_reported_as_conflict(self):
+        Order.objects.filter(pk=self.order.pk).update(status="completed", shelf=None)
+        canceled = self.create_orders(1)[0]
+        Order.objects.filter(pk=canceled.pk).update(status="canceled")
+
+        results = OrderShelfService.place_orders([self.order.order_number, canceled.order_number], self.shelf)
+
+        self.assertEqual(results[self.order.order_number], {
+            "status": OrderShelfService.CONFLICT, "current_shelf": None, "order_status": "completed",
+        })
+        self.assertEqual(results[canceled.order_number]["status"], OrderShelfService.CONFLICT)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, "completed")
+        self.assertEqual(Order.objects.get(pk=canceled.pk).status, "canceled")
+        self.assertFalse(Order.objects.filter(shelf=self.shelf).exists())
+
+    def test_found_order_is_placed_with_history(self):
+        results = OrderShelfService.place_orders([self.order.order_number, "000000-0000"], self.shelf)
+
+        self.assertEqual(results[self.order.order_number], {"status": OrderShelfService.FOUND})
+        self.assertEqual(results["000000-0000"], {"status": OrderShelfService.MISSING})
+        order = Order.objects.get(pk=self.order.pk)
+        self.assertEqual((order.shelf, order.status), (self.shelf, "in_warehouse"))
+        self.assertEqual(order.history.first().history_change_reason, f"Размещён на полке {self.shelf.unique_id}")
+
+
+class UniqueNumberServiceTest(TestCase):
+    """
+    Порядковые номера за день из счётчика DailySequence.
+    """
+
+    def test_block_is_consecutive(self):
+        first = UniqueNumberService.reserve_daily_numbers("tests.sequence", count=5)
+        second = UniqueNumberService.reserve_daily_numbers("tests.sequence", count=3)
+
+        self.assertEqual(list(first), [1, 2, 3, 4, 5])
+        self.assertEqual(list(second), [6, 7, 8])
+        self.assertEqual(DailySequence.objects.get(key="tests.sequence").last_number, 8)
+
+    def test_counter_starts_over_on_new_day(self):
+        today = timezone.now().date()
+        UniqueNumberService.reserve_daily_numbers("tests.sequence", count=4, day=today)
+
+        numbers = UniqueNumberService.reserve_daily_numbers("tests.sequence", count=2, day=today + timedelta(days=1))
+
+        self.assertEqual(list(numbers), [1, 2])
+        self.assertEqual(DailySequence.objects.filter(key="tests.sequence").count(), 2)
+
+    def test_count_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            UniqueNumberService.reserve_daily_numbers("tests.sequence", count=0)
+        self.assertFalse(DailySequence.objects.exists())
+
+    def test_order_numbers_use_sequence(self):
+        numbers = UniqueNumberService.generate_unique_numbers(Order, 2)
+
+        prefix = timezone.now().strftime("%d%m%y")
+        self.assertEqual(numbers, [f"{prefix}-0001", f"{prefix}-0002"])
+
+    def test_route_numbers_use_sequence(self):
+        truck = Truck.objects.create(name="Фура", plate_number="001ABC")
+        first = Route.objects.create(truck=truck)
+        second = Route.objects.create(truck=truck)
+
+        prefix = first.created_at.strftime("%d%m%y")
+        self.assertEqual(first.unique_number, f"{prefix}-001ABC-01")
+        self.assertEqual(second.unique_number, f"{prefix}-001ABC-02")
+        self.assertEqual(DailySequence.objects.get(key="trucks.route").last_number, 2)
@@ -1,15 +1,22 @@
 import json
+from datetime import timedelta
 
 from django.contrib import admin, messages
+from django.http import JsonResponse
 from django.shortcuts import redirect, get_object_or_404
-from django.urls import path
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from unfold.admin import ModelAdmin
+from unfold.decorators import action
 from unfold.views import UnfoldModelAdminViewMixin
-from django.views.generic import TemplateView
+from django.views.generic import TemplateView, View
 
 from orders.models import Order
 from warehouse.models import Shelf
-from .models import DummyModel
-from orders.services import OrderShelfService
+from .models import BackgroundJob, DummyModel, ScanBatch
+from orders.services import OrderShelfService, QRLookupService
+from services.job_queue_service import JobQueueService
 
 
 class InfoOfViewQR(UnfoldModelAdminViewMixin, TemplateView):
@@ -49,11 +56,42 @@ class InfoOfViewQR(UnfoldModelAdminViewMixin, TemplateView):
             return self.render_to_response(self.get_context_data(request=request))
 
 
+class QRResolveView(View):
+    """
+    JSON-эндпоинт страницы "Информация по QR": по коду заказа ("O…") или полки ("W…")
+    возвращает краткую информацию одним запросом, без перехода на страницу изменения.
+
+    Запрос: GET ?code=O181026-0001. Ответ содержит ссылку `url` на полную карточку.
+    Без кода возвращается 400, для неизвестного кода — 404.
+    """
+    http_method_names = ["get"]
+
+    def get(self, request, *args, **kwargs):
+        code = request.GET.get("code", "").strip()
+        if not code:
+            return JsonResponse({"error": "Параметр code обязателен."}, status=400)
+
+        try:
+            result = QRLookupService.resolve(code)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=404)
+
+        opts = (Order if result["type"] == "order" else Shelf)._meta
+        result["url"] = reverse(f"admin:{opts.app_label}_{opts.model_name}_change", args=[result["id"]])
+        return JsonResponse(result)
+
+
 class AddOrdersToShelfViewQR(UnfoldModelAdminViewMixin, TemplateView):
     title = "Добавить заказы на полку"
     permission_required = ()
     template_name = "admin/add_orders_to_shelf_qr.html"
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Очередь сканов на устройстве отправляется частями не больше этого размера
+        context["scan_sync_max_batches"] = ScanSyncView.max_batches
+        return context
+
     def parse_json_field(self, raw_data, field_name):
         """
         Парсит JSON-данные и извлекает значение ключа "value".
@@ -101,7 +139,8 @@ class AddOrdersToShelfViewQR(UnfoldModelAdminViewMixin, TemplateView):
         try:
             result = OrderShelfService.add_orders_to_shelf(
                 order_numbers=order_numbers,
-                shelf_unique_id=shelf_unique_id
+                shelf_unique_id=shelf_unique_id,
+                user=request.user if request.user.is_authenticated else None,
             )
             messages.success(request, result)
         except ValueError as e:
@@ -112,6 +151,142 @@ class AddOrdersToShelfViewQR(UnfoldModelAdminViewMixin, TemplateView):
         return self.render_to_response(self.get_context_data(request=request))
 
 
+def parse_scan_batch(payload):
+    """
+    Проверяет пачку сканов из JSON и возвращает её параметры.
+
+    :raises ValueError: Если пачка некорректна
+    :return: (batch_id, shelf, codes, scanned_at)
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Некорректный JSON.")
+
+    batch_id = str(payload.get("batch_id", "")).strip()
+    shelf_unique_id = str(payload.get("shelf", "")).strip()
+    codes = payload.get("codes")
+    if not batch_id or len(batch_id) > 64:
+        raise ValueError("Идентификатор пачки обязателен.")
+    if not shelf_unique_id:
+        raise ValueError("Уникальный ID полки обязателен.")
+    if not isinstance(codes, list) or not codes:
+        raise ValueError("Номера заказов некорректны или отсутствуют.")
+
+    scanned_at = parse_client_datetime(payload.get("scanned_at"), "Некорректное время сканирования.")
+
+    return batch_id, shelf_unique_id, codes, scanned_at
+
+
+def parse_client_datetime(value, error):
+    """
+    Разбирает время из JSON устройства (ISO 8601), пустое значение — None.
+
+    :raises ValueError: С текстом `error`, если время некорректно
+    """
+    if not value:
+        return None
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        raise ValueError(error)
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def parse_clock_offset(payload):
+    """
+    Возвращает поправку к часам устройства по времени отправки запроса `sent_at`
+    (по часам устройства): разницу между временем сервера и устройства. Без `sent_at`
+    поправка нулевая.
+
+    :raises ValueError: Если время отправки некорректно
+    """
+    sent_at = parse_client_datetime(payload.get("sent_at"), "Некорректное время отправки.")
+    return timezone.now() - sent_at if sent_at else timedelta()
+
+
+def ingest_scan_batch(request, payload, clock_offset=timedelta()):
+    """
+    Обрабатывает одну пачку сканов и возвращает ответ для неё. Время сканирования
+    переводится на часы сервера поправкой `clock_offset` (см. parse_clock_offset).
+
+    :raises ValueError: Если пачка некорректна или полка не найдена
+    """
+    batch_id, shelf_unique_id, codes, scanned_at = parse_scan_batch(payload)
+    if scanned_at is not None:
+        scanned_at += clock_offset
+    response, replayed = OrderShelfService.ingest_scan_batch(
+        batch_id=batch_id,
+        codes=codes,
+        shelf_unique_id=shelf_unique_id,
+        user=request.user,
+        scanned_at=scanned_at,
+    )
+    return {**response, "replayed": replayed}
+
+
+class ScanIngestView(View):
+    """
+    JSON-эндпоинт для страницы сканирования: принимает пачку кодов заказов и полку,
+    возвращает результат по каждому коду без перерисовки страницы.
+
+    Тело запроса: {"batch_id": "...", "shelf": "W010101H", "codes": ["O181026-0001", ...],
+    "scanned_at": "2024-01-01T10:00:00Z", "sent_at": "2024-01-01T10:00:05Z"}. Времена
+    указываются по часам устройства. Повторная отправка с тем же batch_id
+    возвращает сохранённый ответ.
+    """
+    http_method_names = ["post"]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            payload = json.loads(request.body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return JsonResponse({"error": "Некорректный JSON."}, status=400)
+
+        try:
+            clock_offset = parse_clock_offset(payload) if isinstance(payload, dict) else timedelta()
+            return JsonResponse(ingest_scan_batch(request, payload, clock_offset))
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+
+class ScanSyncView(View):
+    """
+    JSON-эндпоинт синхронизации очереди сканов, накопленной на устройстве без сети.
+
+    Тело запроса: {"sent_at": "...", "batches": [<пачка как для ScanIngestView>, ...]}.
+    Пачки обрабатываются независимо: ошибка в одной пачке не отменяет остальные. Заказы,
+    изменённые на сервере после `scanned_at` пачки, не перемещаются и возвращаются
+    со статусом "conflict". `scanned_at` сравнивается с часами сервера с поправкой
+    на расхождение часов устройства, вычисленной по `sent_at`.
+    """
+    http_method_names = ["post"]
+    max_batches = 100
+
+    def post(self, request, *args, **kwargs):
+        try:
+            payload = json.loads(request.body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return JsonResponse({"error": "Некорректный JSON."}, status=400)
+
+        batches = payload.get("batches") if isinstance(payload, dict) else None
+        if not isinstance(batches, list) or not batches:
+            return JsonResponse({"error": "Список пачек пуст."}, status=400)
+        if len(batches) > self.max_batches:
+            return JsonResponse({"error": f"Не более {self.max_batches} пачек за запрос."}, status=400)
+
+        try:
+            clock_offset = parse_clock_offset(payload)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        results = []
+        for batch in batches:
+            try:
+                results.append(ingest_scan_batch(request, batch, clock_offset))
+            except ValueError as e:
+                batch_id = batch.get("batch_id") if isinstance(batch, dict) else None
+                results.append({"batch_id": batch_id, "error": str(e)})
+        return JsonResponse({"batches": results})
+
+
 class DummyModelAdmin(admin.ModelAdmin):
     def get_urls(self):
         custom_urls = [
@@ -120,17 +295,62 @@ class DummyModelAdmin(admin.ModelAdmin):
                 AddOrdersToShelfViewQR.as_view(model_admin=self),  # Передаём model_admin
                 name="add_orders_to_shelf_qr",
             ),
+            path(
+                "add-orders-to-shelf-qr/scan/",
+                self.admin_site.admin_view(ScanIngestView.as_view()),
+                name="add_orders_to_shelf_scan",
+            ),
+            path(
+                "add-orders-to-shelf-qr/sync/",
+                self.admin_site.admin_view(ScanSyncView.as_view()),
+                name="add_orders_to_shelf_sync",
+            ),
             path(
                 "info-qr/",
                 InfoOfViewQR.as_view(model_admin=self),  # Передаём model_admin
                 name="info_qr",
             ),
+            path(
+                "info-qr/resolve/",
+                self.admin_site.admin_view(QRResolveView.as_view()),
+                name="info_qr_resolve",
+            ),
         ]
         return custom_urls + super().get_urls()
 
 
 admin.site.register(DummyModel, DummyModelAdmin)
 
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(ModelAdmin):
+    """Админка очереди фоновых задач."""
+    list_display = ('task', 'content_type', 'object_id', 'status', 'attempts', 'run_after', 'updated_at')
+    list_filter = ('status', 'task')
+    search_fields = ('task', 'object_id', 'last_error')
+    readonly_fields = ('task', 'content_type', 'object_id', 'attempts', 'last_error', 'created_at', 'updated_at')
+    list_select_related = ('content_type',)
+    actions = ['retry_jobs']
+
+    @action(description="Повторить выбранные задачи")
+    def retry_jobs(self, request, queryset):
+        """
+        Возвращает выбранные задачи в очередь. Выполняющиеся задачи возвращаются,
+        только если они зависли (см. `JobQueueService.reap_stale`).
+        """
+        updated = queryset.exclude(
+            status=BackgroundJob.RUNNING, updated_at__gte=JobQueueService.stale_cutoff()
+        ).update(
+            status=BackgroundJob.PENDING,
+            attempts=0,
+            run_after=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        messages.success(request, f"Задач возвращено в очередь: {updated}.")
+
+    def has_add_permission(self, request):
+        return False
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.admin import GroupAdmin as BaseGroupAdmin
@@ -150,3 +370,15 @@ class UserAdmin(BaseUserAdmin, ModelAdmin):
 @admin.register(Group)
 class GroupAdmin(BaseGroupAdmin, ModelAdmin):
     pass
+
+
+@admin.register(ScanBatch)
+class ScanBatchAdmin(ModelAdmin):
+    """Журнал обработанных пачек сканов."""
+    list_display = ('batch_id', 'shelf_unique_id', 'user', 'created_at')
+    search_fields = ('batch_id', 'shelf_unique_id')
+    readonly_fields = ('batch_id', 'shelf_unique_id', 'user', 'response', 'created_at')
+    list_select_related = ('user',)
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,130 @@
+from django import forms
+from django.conf import settings
+from django.contrib.admin.views.autocomplete import AutocompleteJsonView
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse
+from django.urls import path, reverse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+
+class FastAutocompleteJsonView(AutocompleteJsonView):
+    """
+    Автодополнение для админки без COUNT по выборке: поиск выполняет
+    `FastAutocompleteMixin.get_autocomplete_queryset` модели, страницы выбираются
+    по ключу (параметр `after` — pk последнего результата предыдущей страницы).
+    Параметр `page` виджета Select2 поддерживается для совместимости.
+    """
+
+    def get(self, request, *args, **kwargs):
+        self.term, self.model_admin, self.source_field, to_field_name = self.process_request(request)
+
+        if not self.has_perm(request):
+            raise PermissionDenied
+
+        queryset = self.model_admin.get_autocomplete_queryset(request, self.term)
+        queryset = queryset.complex_filter(self.source_field.get_limit_choices_to()).order_by("-pk")
+
+        page_size = self.model_admin.autocomplete_page_size
+        after = request.GET.get("after", "")
+        if after.isdigit():
+            queryset = queryset.filter(pk__lt=int(after))
+        else:
+            page = request.GET.get("page", "")
+            offset = (int(page) - 1) * page_size if page.isdigit() and int(page) > 1 else 0
+            queryset = queryset[offset:]
+
+        # Лишняя запись показывает, есть ли следующая страница, без COUNT
+        objects = list(queryset[:page_size + 1])
+        more = len(objects) > page_size
+        objects = objects[:page_size]
+
+        response = JsonResponse({
+            "results": [
+                {
+                    "id": str(getattr(obj, to_field_name)),
+                    **self.model_admin.serialize_autocomplete_result(obj),
+                }
+                for obj in objects
+            ],
+            "pagination": {
+                "more": more,
+                "next": objects[-1].pk if more else None,
+            },
+        })
+        patch_cache_control(response, private=True, max_age=getattr(settings, "AUTOCOMPLETE_CACHE_TIMEOUT", 30))
+        patch_vary_headers(response, ("Cookie",))
+        return response
+
+
+class FastAutocompleteSelect(AutocompleteSelect):
+    """
+    Виджет автодополнения, который обращается к быстрому эндпоинту связанной модели
+    и листает страницы по ключу `after` (см. admin/js/fast-autocomplete.js).
+    """
+
+    def get_url(self):
+        opts = self.field.remote_field.model._meta
+        return reverse(f"{self.admin_site.name}:{opts.app_label}_{opts.model_name}_autocomplete")
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs=extra_attrs)
+        # Свой класс, чтобы стандартный autocomplete.js не инициализировал виджет
+        attrs["class"] = attrs["class"].replace("admin-autocomplete", "fast-admin-autocomplete")
+        return attrs
+
+    @property
+    def media(self):
+        media = super().media
+        return forms.Media(
+            js=[js for js in media._js if not js.endswith("admin/js/autocomplete.js")]
+            + ["admin/js/fast-autocomplete.js"],
+            css=media._css,
+        )
+
+
+class FastAutocompleteMixin:
+    """
+    Миксин для ModelAdmin модели, по которой выполняется автодополнение:
+    регистрирует эндпоинт `<app>_<model>_autocomplete`.
+    """
+    autocomplete_page_size = 20
+
+    def get_autocomplete_queryset(self, request, term):
+        """
+        Возвращает выборку для автодополнения. По умолчанию — обычный поиск админки.
+        """
+        queryset, may_have_duplicates = self.get_search_results(request, self.get_queryset(request), term)
+        return queryset.distinct() if may_have_duplicates else queryset
+
+    def serialize_autocomplete_result(self, obj):
+        """
+        Возвращает поля результата автодополнения, кроме id.
+        """
+        return {"text": str(obj)}
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path(
+                "autocomplete/",
+                self.admin_site.admin_view(
+                    FastAutocompleteJsonView.as_view(admin_site=self.admin_site), cacheable=True
+                ),
+                name=f"{opts.app_label}_{opts.model_name}_autocomplete",
+            ),
+        ] + super().get_urls()
+
+
+class FastAutocompleteFieldsMixin:
+    """
+    Миксин для ModelAdmin с `autocomplete_fields`: поля, ведущие на модели
+    с `FastAutocompleteMixin`, получают виджет быстрого автодополнения.
+    """
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if "widget" not in kwargs and db_field.name in self.get_autocomplete_fields(request):
+            related_admin = self.admin_site._registry.get(db_field.remote_field.model)
+            if isinstance(related_admin, FastAutocompleteMixin):
+                kwargs["widget"] = FastAutocompleteSelect(db_field, self.admin_site, using=kwargs.get("using"))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.job_queue_service import JobQueueService
+
+
+class Command(BaseCommand):
+    help = "Запускает воркер фоновых задач (генерация QR-кодов, оптимизация изображений)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10, help="Количество задач за одну выборку.")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Пауза (сек.), если очередь пуста.")
+        parser.add_argument("--once", action="store_true", help="Обработать очередь один раз и завершиться.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        while True:
+            processed = JobQueueService.run_pending(limit=batch_size)
+            if processed:
+                self.stdout.write(f"Обработано задач: {processed}")
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["sleep"])
@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.utils import timezone
+
 
 class DummyModel(models.Model):
     """
@@ -13,3 +18,70 @@ class DummyModel(models.Model):
     def __str__(self):
         return self.name or "Фиктивный объект"
 
+
+class BackgroundJob(models.Model):
+    """
+    Фоновая задача над объектом модели (генерация QR-кода, оптимизация изображения).
+    Задачи выполняются командой `manage.py run_background_jobs`.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    task = models.CharField("Задача", max_length=100)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name="Тип объекта")
+    object_id = models.PositiveBigIntegerField("ID объекта")
+    target = GenericForeignKey("content_type", "object_id")
+    status = models.CharField("Статус", max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField("Попытки", default=0)
+    max_attempts = models.PositiveSmallIntegerField("Максимум попыток", default=3)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+    run_after = models.DateTimeField("Запустить после", default=timezone.now)
+    created_at = models.DateTimeField("Дата создания", auto_now_add=True)
+    updated_at = models.DateTimeField("Дата обновления", auto_now=True)
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='background_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.object_id} ({self.get_status_display()})"
+
+
+class ScanBatch(models.Model):
+    """
+    Обработанная пачка сканов со страницы размещения заказов на полке.
+    Повторная отправка пачки с тем же `batch_id` возвращает сохранённый ответ,
+    не изменяя заказы повторно.
+    """
+    batch_id = models.CharField("ID пачки", max_length=64, unique=True)
+    shelf_unique_id = models.CharField("ID полки", max_length=20)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Пользователь",
+    )
+    response = models.JSONField("Ответ", default=dict)
+    created_at = models.DateTimeField("Дата создания", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Пачка сканов"
+        verbose_name_plural = "Пачки сканов"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.batch_id} → {self.shelf_unique_id}"
@@ -1,3 +1,553 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from crm.models import Client, PhoneNumber
+from orders.models import Order
+from warehouse.models import Warehouse, Area, Sector, Shelf
+from services.job_queue_service import JobQueueService
+from .admin import ScanSyncView
+from .models import BackgroundJob, ScanBatch
+
+
+class ScanSyncViewTest(TestCase):
+    """
+    Синхронизация очереди сканов со страницы размещения заказов на полке.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        warehouse = Warehouse.objects.create(name="Склад")
+        area = Area.objects.create(warehouse=warehouse, name="Область")
+        sector = Sector.objects.create(area=area, name="Сектор")
+        cls.shelf = Shelf.objects.create(sector=sector, surface=Shelf.LOWER)
+        cls.other_shelf = Shelf.objects.create(sector=sector, surface=Shelf.UPPER)
+        cls.client_obj = Client.objects.create(full_name="Клиент")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse("admin:add_orders_to_shelf_sync")
+
+    def create_order(self, **kwargs):
+        return Order.objects.create(
+            sender=self.client_obj, receiver=self.client_obj,
+            seat_count=1, price=1000, paid_amount=0, **kwargs,
+        )
+
+    def sync(self, *batches, sent_at=None):
+        payload = {"batches": list(batches)}
+        if sent_at:
+            payload["sent_at"] = sent_at.isoformat()
+        return self.client.post(self.url, json.dumps(payload), content_type="application/json")
+
+    def batch(self, batch_id, codes, shelf=None, scanned_at=None):
+        batch = {"batch_id": batch_id, "shelf": f"W{(shelf or self.shelf).unique_id}", "codes": codes}
+        if scanned_at:
+            batch["scanned_at"] = scanned_at.isoformat()
+        return batch
+
+    def test_places_orders_and_reports_each_code(self):
+        order = self.create_order()
+        placed = self.create_order(shelf=self.shelf, status="in_warehouse")
+
+        response = self.sync(self.batch("b1", [f"O{order.order_number}", placed.order_number, "O000000-0000"]))
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["batches"][0]["results"]
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["found", "already_on_shelf", "missing"],
+        )
+        order.refresh_from_db()
+        self.assertEqual(order.shelf, self.shelf)
+        self.assertEqual(order.status, "in_warehouse")
+        self.assertEqual(order.history.first().history_user, self.user)
+
+    def test_repeated_batch_is_not_applied_twice(self):
+        order = self.create_order()
+        batch = self.batch("b1", [order.order_number])
+
+        first = self.sync(batch).json()["batches"][0]
+        Order.objects.filter(pk=order.pk).update(shelf=self.other_shelf)
+        second = self.sync(batch).json()["batches"][0]
+
+        self.assertFalse(first["replayed"])
+        self.assertTrue(second["replayed"])
+        self.assertEqual(first["results"], second["results"])
+        self.assertEqual(ScanBatch.objects.count(), 1)
+        self.assertEqual(Order.objects.get(pk=order.pk).shelf, self.other_shelf)
+
+    def test_order_changed_after_scan_is_reported_as_conflict(self):
+        order = self.create_order(shelf=self.other_shelf)
+        scanned_at = timezone.now() - timedelta(minutes=5)
+
+        result = self.sync(self.batch("b1", [order.order_number], scanned_at=scanned_at)).json()["batches"][0]
+
+        self.assertEqual(result["results"][0]["status"], "conflict")
+        self.assertEqual(result["results"][0]["current_shelf"], self.other_shelf.unique_id)
+        self.assertEqual(Order.objects.get(pk=order.pk).shelf, self.other_shelf)
+
+    def test_order_unchanged_since_scan_is_placed(self):
+        order = self.create_order()
+        scanned_at = timezone.now() + timedelta(seconds=1)
+
+        result = self.sync(self.batch("b1", [order.order_number], scanned_at=scanned_at)).json()["batches"][0]
+
+        self.assertEqual(result["results"][0]["status"], "found")
+        self.assertEqual(Order.objects.get(pk=order.pk).shelf, self.shelf)
+
+    def test_lagging_device_clock_is_not_a_conflict(self):
+        order = self.create_order()
+        # Часы устройства отстают на 10 минут, скан отправлен сразу
+        device_now = timezone.now() - timedelta(minutes=10)
+
+        result = self.sync(
+            self.batch("b1", [order.order_number], scanned_at=device_now), sent_at=device_now,
+        ).json()["batches"][0]
+
+        self.assertEqual(result["results"][0]["status"], "found")
+        self.assertEqual(Order.objects.get(pk=order.pk).shelf, self.shelf)
+
+    def test_offline_scan_with_lagging_clock_still_conflicts(self):
+        order = self.create_order(shelf=self.other_shelf)
+        # Часы устройства отстают на 10 минут, скан пролежал в очереди 5 минут
+        device_now = timezone.now() - timedelta(minutes=10)
+
+        result = self.sync(
+            self.batch("b1", [order.order_number], scanned_at=device_now - timedelta(minutes=5)),
+            sent_at=device_now,
+        ).json()["batches"][0]
+
+        self.assertEqual(result["results"][0]["status"], "conflict")
+        self.assertEqual(Order.objects.get(pk=order.pk).shelf, self.other_shelf)
+
+    def test_queue_larger_than_limit_is_synced_in_parts(self):
+        orders = [self.create_order() for _ in range(5)]
+        queue = [self.batch(f"b{i}", [order.order_number]) for i, order in enumerate(orders)]
+
+        with patch.object(ScanSyncView, "max_batches", 2):
+            self.assertEqual(self.sync(*queue).status_code, 400)
+            self.assertFalse(ScanBatch.objects.exists())
+
+            # Устройство отправляет очередь частями по max_batches, пока она не опустеет
+            results = []
+            while queue:
+                response = self.sync(*queue[:ScanSyncView.max_batches])
+                self.assertEqual(response.status_code, 200)
+                processed = {batch["batch_id"] for batch in response.json()["batches"]}
+                queue = [batch for batch in queue if batch["batch_id"] not in processed]
+                results += response.json()["batches"]
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(ScanBatch.objects.count(), 5)
+        self.assertEqual(Order.objects.filter(shelf=self.shelf).count(), 5)
+
+    def test_page_passes_sync_limit_to_queue(self):
+        response = self.client.get(reverse("admin:add_orders_to_shelf_qr"))
+
+        self.assertContains(response, f'data-sync-max-batches="{ScanSyncView.max_batches}"')
+
+    def test_invalid_batch_does_not_abort_others(self):
+        order = self.create_order()
+
+        response = self.sync(
+            {"batch_id": "bad", "shelf": "W000000X", "codes": [order.order_number]},
+            self.batch("good", [order.order_number]),
+        )
+
+        bad, good = response.json()["batches"]
+        self.assertEqual(bad["batch_id"], "bad")
+        self.assertIn("error", bad)
+        self.assertEqual(good["results"][0]["status"], "found")
+        self.assertFalse(ScanBatch.objects.filter(batch_id="bad").exists())
+
+    def test_invalid_payload(self):
+        response = self.client.post(self.url, "not json", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        response = self.sync()
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(
+            self.url, json.dumps({"sent_at": "вчера", "batches": [self.batch("b1", ["000000-0000"])]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_staff_login(self):
+        self.client.logout()
+        response = self.sync(self.batch("b1", ["000000-0000"]))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(ScanBatch.objects.exists())
+
+
+class QRResolveViewTest(TestCase):
+    """
+    Краткая информация по QR-коду заказа или полки.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        warehouse = Warehouse.objects.create(name="Склад")
+        area = Area.objects.create(warehouse=warehouse, name="Область")
+        sector = Sector.objects.create(area=area, name="Сектор")
+        cls.shelf = Shelf.objects.create(sector=sector, surface=Shelf.LOWER)
+        cls.receiver = Client.objects.create(full_name="Получатель")
+        PhoneNumber.objects.create(client=cls.receiver, number="87011234567")
+        cls.order = Order.objects.create(
+            sender=cls.receiver, receiver=cls.receiver, shelf=cls.shelf,
+            seat_count=2, price=1000, paid_amount=400,
+        )
+        Order.objects.create(
+            sender=cls.receiver, receiver=cls.receiver, shelf=cls.shelf, seat_count=1, price=500, paid_amount=0,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse("admin:info_qr_resolve")
+
+    def test_order_code(self):
+        response = self.client.get(self.url, {"code": f"O{self.order.order_number}"})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["type"], "order")
+        self.assertEqual(data["order_number"], self.order.order_number)
+        self.assertEqual(data["debt"], "600.00")
+        self.assertEqual(data["receiver"], {"full_name": "Получатель", "phone": "87011234567"})
+        self.assertEqual(data["shelf"]["unique_id"], self.shelf.unique_id)
+        self.assertEqual(data["url"], reverse("admin:orders_order_change", args=[self.order.pk]))
+
+    def test_shelf_code(self):
+        response = self.client.get(self.url, {"code": f"W{self.shelf.unique_id}"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            "type": "shelf",
+            "id": self.shelf.pk,
+            "unique_id": self.shelf.unique_id,
+            "surface": self.shelf.get_surface_display(),
+            "location": "Склад / Область / Сектор",
+            "orders_count": 2,
+            "url": reverse("admin:warehouse_shelf_change", args=[self.shelf.pk]),
+        })
+
+    def test_unknown_code(self):
+        for code in ("O000000-0000", "W000000X", "X1"):
+            with self.subTest(code=code):
+                response = self.client.get(self.url, {"code": code})
+                self.assertEqual(response.status_code, 404)
+                self.assertIn("error", response.json())
+
+    def test_missing_code(self):
+        for params in ({}, {"code": "  "}):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+
+
+class ScanIngestViewTest(TestCase):
+    """
+    Приём одной пачки сканов со страницы размещения заказов на полке.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        warehouse = Warehouse.objects.create(name="Склад")
+        area = Area.objects.create(warehouse=warehouse, name="Область")
+        sector = Sector.objects.create(area=area, name="Сектор")
+        cls.shelf = Shelf.objects.create(sector=sector, surface=Shelf.LOWER)
+        cls.other_shelf = Shelf.objects.create(sector=sector, surface=Shelf.UPPER)
+        cls.client_obj = Client.objects.create(full_name="Клиент")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse("admin:add_orders_to_shelf_scan")
+        self.order = Order.objects.create(
+            sender=self.client_obj, receiver=self.client_obj, seat_count=1, price=1000, paid_amount=0,
+        )
+
+    def post(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type="application/json")
+
+    def test_places_orders(self):
+        response = self.post({
+            "batch_id": "b1", "shelf": f"W{self.shelf.unique_id}", "codes": [f"O{self.order.order_number}"],
+        })
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertFalse(data["replayed"])
+        self.assertEqual(data["results"], [{
+            "code": f"O{self.order.order_number}", "order_number": self.order.order_number, "status": "found",
+        }])
+        self.assertEqual(Order.objects.get(pk=self.order.pk).shelf, self.shelf)
+
+    def test_replayed_batch_returns_stored_response(self):
+        payload = {"batch_id": "b1", "shelf": f"W{self.shelf.unique_id}", "codes": [self.order.order_number]}
+        first = self.post(payload).json()
+        history_count = self.order.history.count()
+        Order.objects.filter(pk=self.order.pk).update(shelf=self.other_shelf)
+
+        second = self.post(payload).json()
+
+        self.assertTrue(second["replayed"])
+        self.assertEqual(second["results"], first["results"])
+        self.assertEqual(Order.objects.get(pk=self.order.pk).shelf, self.other_shelf)
+        self.assertEqual(self.order.history.count(), history_count)
+        self.assertEqual(ScanBatch.objects.count(), 1)
+
+    def test_malformed_payload(self):
+        response = self.client.post(self.url, "{", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        for payload in (
+            [],
+            {"shelf": f"W{self.shelf.unique_id}", "codes": [self.order.order_number]},
+            {"batch_id": "b1", "codes": [self.order.order_number]},
+            {"batch_id": "b1", "shelf": f"W{self.shelf.unique_id}", "codes": "O1"},
+            {"batch_id": "b1", "shelf": "W000000X", "codes": [self.order.order_number]},
+            {"batch_id": "b1", "shelf": f"W{self.shelf.unique_id}", "codes": ["1"], "scanned_at": "вчера"},
+        ):
+            with self.subTest(payload=payload):
+                response = self.post(payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+        self.assertFalse(ScanBatch.objects.exists())
+
+
+@override_settings(BACKGROUND_JOBS_EAGER=False, BACKGROUND_JOBS_MAX_ATTEMPTS=2, BACKGROUND_JOBS_RETRY_DELAY=60)
+class JobQueueServiceTest(TestCase):
+    """
+    Очередь фоновых задач на базе таблицы BackgroundJob, без брокера.
+    """
+    TASK = "tests.rename_client"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_obj = Client.objects.create(full_name="Клиент")
+
+    def setUp(self):
+        self.calls = []
+        self.fail = False
+
+        def handler(instance):
+            self.calls.append(instance.pk)
+            if self.fail:
+                raise RuntimeError("Ошибка обработчика")
+
+        JobQueueService.register(self.TASK)(handler)
+        self.addCleanup(JobQueueService._handlers.pop, self.TASK)
+
+    def test_enqueue_creates_pending_job(self):
+        job = JobQueueService.enqueue(self.TASK, self.client_obj)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJob.PENDING)
+        self.assertEqual(job.target, self.client_obj)
+        self.assertEqual(job.max_attempts, 2)
+        self.assertEqual(self.calls, [])
+
+    def test_enqueue_unknown_task(self):
+        with self.assertRaises(ValueError):
+            JobQueueService.enqueue("tests.unknown", self.client_obj)
+
+    def test_claim_and_run(self):
+        job = JobQueueService.enqueue(self.TASK, self.client_obj)
+
+        claimed = JobQueueService.claim_pending()
+        self.assertEqual([claimed_job.pk for claimed_job in claimed], [job.pk])
+        self.assertEqual(BackgroundJob.objects.get(pk=job.pk).status, BackgroundJob.RUNNING)
+        self.assertEqual(JobQueueService.claim_pending(), [])
+
+        self.assertTrue(JobQueueService.run_job(claimed[0]))
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJob.DONE)
+        self.assertEqual(self.calls, [self.client_obj.pk])
+
+    def test_claim_skips_delayed_jobs(self):
+        job = JobQueueService.enqueue(self.TASK, self.client_obj)
+        BackgroundJob.objects.filter(pk=job.pk).update(run_after=timezone.now() + timedelta(minutes=1))
+
+        self.assertEqual(JobQueueService.run_pending(), 0)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        self.fail = True
+        job = JobQueueService.enqueue(self.TASK, self.client_obj)
+
+        before = timezone.now()
+        self.assertEqual(JobQueueService.run_pending(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJob.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.last_error, "Ошибка обработчика")
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=60))
+        self.assertEqual(JobQueueService.run_pending(), 0)
+
+    def test_job_fails_after_max_attempts(self):
+        self.fail = True
+        job = JobQueueService.enqueue(self.TASK, self.client_obj)
+
+        for _ in range(2):
+            BackgroundJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            JobQueueService.run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJob.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(len(self.calls), 2)
+
+    @override_settings(BACKGROUND_JOBS_STALE_TIMEOUT=60)
+    def test_stale_running_job_is_reclaimed(self):
+        job = JobQueueService.enqueue(self.TASK, self.client_obj)
+        JobQueueService.claim_pending()
+        BackgroundJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+
+        claimed = JobQueueService.claim_pending()
+
+        self.assertEqual([claimed_job.pk for claimed_job in claimed], [job.pk])
+        self.assertEqual(claimed[0].attempts, 1)
+
+    @override_settings(BACKGROUND_JOBS_STALE_TIMEOUT=60)
+    def test_stale_job_without_attempts_left_fails(self):
+        job = JobQueueService.enqueue(self.TASK, self.client_obj)
+        BackgroundJob.objects.filter(pk=job.pk).update(
+            status=BackgroundJob.RUNNING, attempts=1, updated_at=timezone.now() - timedelta(minutes=5)
+        )
+
+        self.assertEqual(JobQueueService.claim_pending(), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJob.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    @override_settings(BACKGROUND_JOBS_EAGER=True)
+    def test_eager_mode_runs_job_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = JobQueueService.enqueue(self.TASK, self.client_obj)
+            self.assertEqual(self.calls, [])
+
+        self.assertEqual(self.calls, [self.client_obj.pk])
+        self.assertEqual(BackgroundJob.objects.get(pk=job.pk).status, BackgroundJob.DONE)
+
+    @override_settings(BACKGROUND_JOBS_EAGER=True)
+    def test_eager_mode_skips_job_claimed_by_worker(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            job = JobQueueService.enqueue(self.TASK, self.client_obj)
+        JobQueueService.claim_pending()
+
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(self.calls, [])
+        self.assertEqual(BackgroundJob.objects.get(pk=job.pk).status, BackgroundJob.RUNNING)
+
+
+class BackgroundJobAdminTest(TestCase):
+    """
+    Повтор задач из админки.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        cls.client_obj = Client.objects.create(full_name="Клиент")
+
+    def create_job(self, status, updated_at):
+        job = BackgroundJob.objects.create(
+            task="orders.generate_qr_code", content_type=ContentType.objects.get_for_model(Client),
+            object_id=self.client_obj.pk, status=status, attempts=3,
+        )
+        BackgroundJob.objects.filter(pk=job.pk).update(updated_at=updated_at)
+        return job
+
+    @override_settings(BACKGROUND_JOBS_STALE_TIMEOUT=60)
+    def test_retry_resets_failed_and_stale_jobs(self):
+        failed = self.create_job(BackgroundJob.FAILED, timezone.now())
+        stale = self.create_job(BackgroundJob.RUNNING, timezone.now() - timedelta(minutes=5))
+        running = self.create_job(BackgroundJob.RUNNING, timezone.now())
+
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse("admin:qr_handler_backgroundjob_changelist"),
+            {"action": "retry_jobs", "_selected_action": [failed.pk, stale.pk, running.pk]},
+        )
+
+        statuses = dict(BackgroundJob.objects.values_list("pk", "status"))
+        self.assertEqual(statuses[failed.pk], BackgroundJob.PENDING)
+        self.assertEqual(statuses[stale.pk], BackgroundJob.PENDING)
+        self.assertEqual(statuses[running.pk], BackgroundJob.RUNNING)
+
+
+class FastAutocompleteTest(TestCase):
+    """
+    Быстрое автодополнение клиентов в форме заказа.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        cls.clients = [Client.objects.create(full_name=f"Клиент {i:02}") for i in range(25)]
+        PhoneNumber.objects.create(client=cls.clients[3], number="87011234567")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def autocomplete(self, **params):
+        response = self.client.get(reverse("admin:crm_client_autocomplete"), {
+            "app_label": "orders", "model_name": "order", "field_name": "receiver", **params,
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_response_shape(self):
+        data = self.autocomplete(term="Клиент 03")
+
+        self.assertEqual(data, {
+            "results": [{
+                "id": str(self.clients[3].pk),
+                "text": "Клиент 03 (87011234567)",
+                "phones": ["87011234567"],
+            }],
+            "pagination": {"more": False, "next": None},
+        })
+
+    def test_phone_suffix_matches(self):
+        data = self.autocomplete(term="4567")
+
+        self.assertEqual([result["id"] for result in data["results"]], [str(self.clients[3].pk)])
+
+    def test_pages_by_key(self):
+        first = self.autocomplete(term="Клиент")
+        self.assertEqual(len(first["results"]), 20)
+        self.assertTrue(first["pagination"]["more"])
+        self.assertEqual(first["pagination"]["next"], int(first["results"][-1]["id"]))
+
+        second = self.autocomplete(term="Клиент", after=first["pagination"]["next"])
+        self.assertEqual(len(second["results"]), 5)
+        self.assertEqual(second["pagination"], {"more": False, "next": None})
+
+        ids = [result["id"] for result in first["results"] + second["results"]]
+        self.assertCountEqual(ids, [str(client.pk) for client in self.clients])
+
+    def test_page_parameter_is_still_supported(self):
+        data = self.autocomplete(term="Клиент", page=2)
+
+        self.assertEqual(len(data["results"]), 5)
+
+    def test_order_form_uses_keyset_widget(self):
+        response = self.client.get(reverse("admin:orders_order_add"))
+
+        self.assertContains(response, "fast-admin-autocomplete")
+        self.assertContains(response, "admin/js/fast-autocomplete.js")
+        self.assertNotContains(response, "admin/js/autocomplete.js")
@@ -1,12 +1,23 @@
 from django.contrib.humanize.templatetags.humanize import intcomma
-from django.db.models import Count, Sum
 from django.utils.safestring import mark_safe
-from orders.models import Order
+from orders.services import OrderStatsService
 from datetime import timedelta
 from django.utils.timezone import now
 
 
 def dashboard_callback(request, context):
+    """
+    Добавляет показатели дашборда в контекст. Показатели берутся из кэша
+    и пересчитываются только после изменения заказов или истечения TTL.
+    """
+    context.update(OrderStatsService.get_cached(build_dashboard_kpis))
+    return context
+
+
+def build_dashboard_kpis():
+    """
+    Вычисляет карточки показателей для дашборда.
+    """
     # Текущая дата
     today = now().date()
 
@@ -16,27 +27,36 @@ def dashboard_callback(request, context):
     this_week_start = today - timedelta(days=7)
     this_week_end = today
 
-    # Заказы за текущую и прошлую недели
-    def get_weekly_count(status, start_date, end_date):
-        return Order.objects.filter(status=status, date__date__gte=start_date, date__date__lte=end_date).count()
+    # Количество заказов по статусам за текущую и прошлую недели — одним запросом
+    weekly_counts = OrderStatsService.get_period_counts(
+        {
+            "this_week": (this_week_start, this_week_end),
+            "last_week": (last_week_start, last_week_end),
+        },
+        statuses=["accepted", "in_warehouse", "completed", "return", "canceled"],
+    )
+    this_week, last_week = weekly_counts["this_week"], weekly_counts["last_week"]
 
     # Текущая неделя
-    this_week_accepted = get_weekly_count("accepted", this_week_start, this_week_end)
-    this_week_in_warehouse = get_weekly_count("in_warehouse", this_week_start, this_week_end)
-    this_week_completed = get_weekly_count("completed", this_week_start, this_week_end)
+    this_week_accepted = this_week["accepted"]
+    this_week_in_warehouse = this_week["in_warehouse"]
+    this_week_completed = this_week["completed"]
 
     # Предыдущая неделя
-    last_week_accepted = get_weekly_count("accepted", last_week_start, last_week_end)
-    last_week_in_warehouse = get_weekly_count("in_warehouse", last_week_start, last_week_end)
-    last_week_completed = get_weekly_count("completed", last_week_start, last_week_end)
+    last_week_accepted = last_week["accepted"]
+    last_week_in_warehouse = last_week["in_warehouse"]
+    last_week_completed = last_week["completed"]
 
     # Возвраты и отмены за текущую неделю
-    this_week_returns = get_weekly_count("return", this_week_start, this_week_end)
-    this_week_canceled = get_weekly_count("canceled", this_week_start, this_week_end)
+    this_week_returns = this_week["return"]
+    this_week_canceled = this_week["canceled"]
+
+    # Показатели за всё время — одним запросом
+    totals = OrderStatsService.get_totals()
 
     # Процент безналичных оплат
-    total_orders = Order.objects.count()
-    total_cashless_orders = Order.objects.filter(is_cashless=True).count()
+    total_orders = totals["total_orders"]
+    total_cashless_orders = totals["total_cashless_orders"]
     cashless_percentage = (total_cashless_orders / total_orders * 100) if total_orders > 0 else 0
 
     # Расчёт процентного изменения
@@ -97,9 +117,9 @@ def dashboard_callback(request, context):
     ]
 
     # KPI 2: Общая информация
-    total_items_in_warehouse = Order.objects.filter(status="in_warehouse").count()
-    total_paid = Order.objects.filter(status="in_warehouse").aggregate(total_paid=Sum("paid_amount"))["total_paid"] or 0
-    total_price = Order.objects.filter(status="in_warehouse").aggregate(total_price=Sum("price"))["total_price"] or 0
+    total_items_in_warehouse = totals["total_items_in_warehouse"]
+    total_paid = totals["total_paid"]
+    total_price = totals["total_price"]
     total_due = total_price - total_paid
 
     kpi_data2 = [
@@ -120,11 +140,8 @@ def dashboard_callback(request, context):
         },
     ]
 
-    # Добавление данных в контекст
-    context.update({
+    return {
         "kpi": kpi_data,
         "kpi1": kpi_data1,
         "kpi2": kpi_data2,
-    })
-
-    return context
\ No newline at end of file
+    }
\ No newline at end of file
@@ -0,0 +1,232 @@
+# services/job_queue_service.py
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+class JobQueueService:
+    """
+    Очередь фоновых задач на базе таблицы `BackgroundJob`.
+
+    Обработчики регистрируются декоратором `register` и получают экземпляр модели,
+    для которого была поставлена задача.
+    """
+    _handlers = {}
+
+    @classmethod
+    def register(cls, task):
+        """
+        Регистрирует обработчик задачи.
+
+        Args:
+            task: Имя задачи (например, "orders.generate_qr_code").
+        """
+        def decorator(handler):
+            cls._handlers[task] = handler
+            return handler
+
+        return decorator
+
+    @staticmethod
+    def _job_model():
+        return apps.get_model("qr_handler", "BackgroundJob")
+
+    @classmethod
+    def enqueue(cls, task, instance):
+        """
+        Ставит задачу для объекта в очередь.
+
+        Args:
+            task: Имя зарегистрированной задачи.
+            instance: Сохранённый экземпляр модели.
+
+        Returns:
+            Созданная задача `BackgroundJob`.
+        """
+        return cls.enqueue_many(task, [instance])[0]
+
+    @classmethod
+    def enqueue_many(cls, task, instances):
+        """
+        Ставит задачу в очередь для набора объектов одним запросом.
+
+        Args:
+            task: Имя зарегистрированной задачи.
+            instances: Сохранённые экземпляры одной модели.
+
+        Returns:
+            Список созданных задач.
+        """
+        if task not in cls._handlers:
+            raise ValueError(f"Задача {task} не зарегистрирована.")
+
+        instances = list(instances)
+        if not instances:
+            return []
+
+        job_model = cls._job_model()
+        content_type = ContentType.objects.get_for_model(instances[0])
+        jobs = job_model.objects.bulk_create([
+            job_model(
+                task=task,
+                content_type=content_type,
+                object_id=instance.pk,
+                max_attempts=getattr(settings, "BACKGROUND_JOBS_MAX_ATTEMPTS", 3),
+            )
+            for instance in instances
+        ])
+
+        # В режиме eager задачи выполняются сразу после фиксации транзакции.
+        # Выполняются только задачи, которые удалось забрать: их мог уже взять воркер.
+        if getattr(settings, "BACKGROUND_JOBS_EAGER", False):
+            job_ids = [job.pk for job in jobs]
+            transaction.on_commit(lambda: [cls.run_job(job) for job in cls.claim_jobs(job_ids)])
+
+        return jobs
+
+    @staticmethod
+    def stale_cutoff():
+        """
+        Момент, раньше которого выполняющаяся задача считается прерванной
+        (воркер остановлен во время выполнения).
+        """
+        stale_timeout = getattr(settings, "BACKGROUND_JOBS_STALE_TIMEOUT", 15 * 60)
+        return timezone.now() - timedelta(seconds=stale_timeout)
+
+    @classmethod
+    def reap_stale(cls):
+        """
+        Возвращает в очередь задачи, которые выполняются дольше `BACKGROUND_JOBS_STALE_TIMEOUT`.
+        Прерванный запуск считается попыткой: задачи с исчерпанными попытками
+        помечаются как ошибочные.
+
+        Returns:
+            Количество возвращённых в очередь задач.
+        """
+        job_model = cls._job_model()
+        now = timezone.now()
+        stale = job_model.objects.filter(status=job_model.RUNNING, updated_at__lt=cls.stale_cutoff())
+        error = "Выполнение прервано: задача не завершилась за отведённое время."
+
+        stale.filter(attempts__gte=F('max_attempts') - 1).update(
+            status=job_model.FAILED,
+            attempts=F('attempts') + 1,
+            last_error=error,
+            updated_at=now,
+        )
+        return stale.update(
+            status=job_model.PENDING,
+            attempts=F('attempts') + 1,
+            last_error=error,
+            run_after=now,
+            updated_at=now,
+        )
+
+    @classmethod
+    def _claim(cls, queryset, limit=None):
+        """
+        Помечает ожидающие задачи выборки как выполняющиеся. Заблокированные
+        другим воркером строки пропускаются.
+        """
+        job_model = cls._job_model()
+        with transaction.atomic():
+            queryset = queryset.select_for_update(skip_locked=True).filter(status=job_model.PENDING)
+            jobs = list(queryset[:limit] if limit else queryset)
+            job_model.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=job_model.RUNNING,
+                updated_at=timezone.now(),
+            )
+        for job in jobs:
+            job.status = job_model.RUNNING
+        return jobs
+
+    @classmethod
+    def claim_jobs(cls, job_ids):
+        """
+        Забирает конкретные задачи, если они ещё ожидают выполнения.
+
+        Args:
+            job_ids: ID задач.
+
+        Returns:
+            Список задач со статусом "running".
+        """
+        return cls._claim(cls._job_model().objects.filter(pk__in=job_ids))
+
+    @classmethod
+    def claim_pending(cls, limit=10):
+        """
+        Забирает пачку готовых к выполнению задач и помечает их как выполняющиеся.
+        Перед выборкой в очередь возвращаются зависшие задачи (см. `reap_stale`).
+
+        Args:
+            limit: Максимальное количество задач.
+
+        Returns:
+            Список задач со статусом "running".
+        """
+        cls.reap_stale()
+        return cls._claim(
+            cls._job_model().objects.filter(run_after__lte=timezone.now()).order_by('run_after'),
+            limit=limit,
+        )
+
+    @classmethod
+    def run_job(cls, job):
+        """
+        Выполняет задачу и фиксирует результат. При ошибке задача возвращается в очередь
+        с увеличивающейся задержкой, пока не исчерпаны попытки.
+
+        Args:
+            job: Экземпляр `BackgroundJob`.
+
+        Returns:
+            bool: True, если задача выполнена успешно.
+        """
+        job.attempts += 1
+        try:
+            handler = cls._handlers.get(job.task)
+            if handler is None:
+                raise ValueError(f"Задача {job.task} не зарегистрирована.")
+            try:
+                instance = job.content_type.get_object_for_this_type(pk=job.object_id)
+            except ObjectDoesNotExist:
+                raise ValueError(f"Объект #{job.object_id} не найден.")
+            handler(instance)
+        except Exception as e:
+            job.last_error = str(e)
+            if job.attempts >= job.max_attempts:
+                job.status = job.FAILED
+            else:
+                job.status = job.PENDING
+                retry_delay = getattr(settings, "BACKGROUND_JOBS_RETRY_DELAY", 60)
+                job.run_after = timezone.now() + timedelta(seconds=retry_delay * job.attempts)
+            job.save(update_fields=['status', 'attempts', 'last_error', 'run_after', 'updated_at'])
+            return False
+
+        job.status = job.DONE
+        job.last_error = ""
+        job.save(update_fields=['status', 'attempts', 'last_error', 'updated_at'])
+        return True
+
+    @classmethod
+    def run_pending(cls, limit=10):
+        """
+        Выполняет пачку ожидающих задач.
+
+        Args:
+            limit: Максимальное количество задач за вызов.
+
+        Returns:
+            Количество обработанных задач.
+        """
+        jobs = cls.claim_pending(limit)
+        for job in jobs:
+            cls.run_job(job)
+        return len(jobs)
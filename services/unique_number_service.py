@@ -1,34 +1,93 @@
 # services/unique_number_service.py
-from django.utils import timezone
+from django.apps import apps
+from django.db import connection
 from django.db.models import Max
+from django.utils import timezone
 
 class UniqueNumberService:
     @staticmethod
-    def generate_unique_number(model, date_field="created_at", prefix_format="%d%m%y", id_field="id"):
+    def reserve_daily_numbers(key, count=1, day=None):
         """
-        Генерирует уникальный номер для записи.
+        Атомарно резервирует блок порядковых номеров в пределах дня.
+
+        Счётчик хранится в таблице `DailySequence`, а резервирование выполняется одним
+        запросом INSERT ... ON CONFLICT DO UPDATE ... RETURNING, поэтому параллельные
+        запросы не могут получить одинаковые номера.
 
         Args:
-            model: Модель Django для запроса.
-            date_field: Поле даты создания записи.
+            key: Ключ последовательности (например, "orders.order").
+            count: Количество резервируемых номеров.
+            day: Дата, для которой ведётся счётчик (по умолчанию текущая).
+
+        Returns:
+            range: Диапазон зарезервированных порядковых номеров.
+        """
+        if count < 1:
+            raise ValueError("Количество резервируемых номеров должно быть положительным.")
+
+        sequence_model = apps.get_model("orders", "DailySequence")
+        day = day or timezone.now().date()
+        quote_name = connection.ops.quote_name
+        table = quote_name(sequence_model._meta.db_table)
+        key_column, day_column, number_column = (
+            quote_name(sequence_model._meta.get_field(name).column)
+            for name in ("key", "day", "last_number")
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({key_column}, {day_column}, {number_column}) "
+                f"VALUES (%s, %s, %s) "
+                f"ON CONFLICT ({key_column}, {day_column}) "
+                f"DO UPDATE SET {number_column} = {table}.{number_column} + EXCLUDED.{number_column} "
+                f"RETURNING {number_column}",
+                [key, day, count],
+            )
+            last_number = cursor.fetchone()[0]
+
+        return range(last_number - count + 1, last_number + 1)
+
+    @staticmethod
+    def generate_unique_numbers(model, count, prefix_format="%d%m%y"):
+        """
+        Генерирует блок уникальных номеров для записей одним запросом.
+
+        Args:
+            model: Модель Django, для которой генерируются номера.
+            count: Количество номеров.
             prefix_format: Формат для создания префикса на основе даты.
-            id_field: Поле для уникального идентификатора (например, id).
 
         Returns:
-            Уникальный номер в формате "дата-уникальный_ID".
+            Список номеров в формате "дата-порядковый_номер".
         """
         creation_date = timezone.now()
-        start_of_day = creation_date.date()
-        unique_id = (
-            model.objects.filter(**{f"{date_field}__date": start_of_day})
-            .aggregate(max_id=Max(id_field))["max_id"] or 0
+        numbers = UniqueNumberService.reserve_daily_numbers(
+            key=model._meta.label_lower,
+            count=count,
+            day=creation_date.date(),
         )
-        return f"{creation_date.strftime(prefix_format)}-{unique_id + 1:04d}"
+        prefix = creation_date.strftime(prefix_format)
+        return [f"{prefix}-{number:04d}" for number in numbers]
+
+    @staticmethod
+    def generate_unique_number(model, prefix_format="%d%m%y"):
+        """
+        Генерирует уникальный номер для записи.
+
+        Args:
+            model: Модель Django, для которой генерируется номер.
+            prefix_format: Формат для создания префикса на основе даты.
+
+        Returns:
+            Уникальный номер в формате "дата-порядковый_номер".
+        """
+        return UniqueNumberService.generate_unique_numbers(model, 1, prefix_format)[0]
 
     @staticmethod
     def generate_surface_unique_id(instance, unique_field="unique_id"):
         """
         Генерирует уникальный ID на основе объекта модели (instance), автоматически строя surface-коды и компоненты.
+        Компоненты берутся из денормализованных полей расположения полки (см. Shelf.refresh_location).
 
         Args:
             instance: Экземпляр модели, для которого генерируется ID.
@@ -45,9 +104,9 @@ class UniqueNumberService:
         }
 
         base_components = [
-            instance.sector.area.warehouse.unique_id,
-            instance.sector.area.unique_id,
-            instance.sector.unique_id,
+            instance.warehouse_unique_id,
+            instance.area_unique_id,
+            instance.sector_unique_id,
         ]
         surface_code = surface_codes.get(instance.surface, "X")
 
@@ -62,44 +121,25 @@ class UniqueNumberService:
         return unique_id
 
     @staticmethod
-    def generate_route_unique_number(instance, truck_plate_field="truck", unique_field="unique_number"):
+    def generate_route_unique_number(instance, truck_plate_field="truck"):
         """
-        Генерирует уникальный номер для маршрута на основе даты, номера машины и ID.
+        Генерирует уникальный номер для маршрута на основе даты, номера машины и
+        порядкового номера маршрута за день. Порядковый номер выдаётся атомарно
+        счётчиком `DailySequence`, сам маршрут при этом не сохраняется.
 
         Args:
             instance: Экземпляр модели.
             truck_plate_field: Поле, содержащее информацию о номере машины.
-            unique_field: Поле, куда сохраняется уникальный номер.
 
         Returns:
             Строка уникального номера маршрута.
         """
-        from django.utils.timezone import now
-
-        # Устанавливаем дату создания, если она ещё не определена
-        creation_date = instance.created_at or now()
-        instance.created_at = creation_date
-
-        # Первичное сохранение для получения `pk`
-        instance.save()
-
-        # Формируем уникальный ID для маршрута
-        start_of_day = creation_date.date()
-        model = instance.__class__
-        unique_id = (
-            model.objects.filter(created_at__date=start_of_day)
-            .aggregate(max_id=Max("id"))["max_id"] or 0
-        )
-
-        # Генерация номера
-        plate_number = getattr(instance.truck, "plate_number", "NO-PLATE")
-        unique_number = f"{creation_date.strftime('%d%m%y')}-{plate_number}-{unique_id + 1:02d}"
-
-        # Сохранение номера
-        setattr(instance, unique_field, unique_number)
-        instance.save(update_fields=[unique_field])
-
-        return unique_number
+        creation_date = instance.created_at or timezone.now()
+        number = UniqueNumberService.reserve_daily_numbers(
+            instance._meta.label_lower, day=creation_date.date()
+        )[0]
+        plate_number = getattr(getattr(instance, truck_plate_field, None), "plate_number", "NO-PLATE")
+        return f"{creation_date.strftime('%d%m%y')}-{plate_number}-{number:02d}"
 
     @staticmethod
     def generate_unique_id(model, prefix="", filters=None, id_field="id"):
@@ -195,6 +195,51 @@ DATETIME_INPUT_FORMATS = [
 # Для использования Pillow
 OPTIMIZED_IMAGE_METHOD = 'pillow'
 
+# Фоновые задачи (воркер: python manage.py run_background_jobs)
+BACKGROUND_JOBS_EAGER = False  # True — выполнять задачи сразу после сохранения, без воркера
+BACKGROUND_JOBS_MAX_ATTEMPTS = 3
+BACKGROUND_JOBS_RETRY_DELAY = 60  # Секунды, умножаются на номер попытки
+BACKGROUND_JOBS_STALE_TIMEOUT = 15 * 60  # Секунды; задачи в статусе «Выполняется» дольше — считаются прерванными
+
+# Экспорт заказов: количество строк, читаемых из базы за один запрос
+ORDER_EXPORT_CHUNK_SIZE = 2000
+
+# Кэш (по умолчанию — в памяти процесса)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "sm-logistic",
+    }
+}
+
+# Файловый кэш — общий для всех воркеров на сервере, сброс кэша виден сразу всем процессам
+# CACHES = {
+#     "default": {
+#         "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+#         "LOCATION": os.path.join(BASE_DIR, "cache"),
+#     }
+# }
+
+# Время жизни кэша показателей дашборда (секунды)
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Время кэширования ответов автодополнения в браузере (секунды)
+AUTOCOMPLETE_CACHE_TIMEOUT = 30
+
+# Движок генерации PDF-чеков: 'xhtml2pdf' или 'weasyprint' (нужны системные библиотеки Pango)
+RECEIPT_PDF_BACKEND = 'xhtml2pdf'
+
+# Генерация PDF-чеков: число процессов для больших выборок (1 — без пула процессов)
+# и количество заказов в одной пачке, которую рендерит процесс
+RECEIPT_PDF_WORKERS = min(os.cpu_count() or 1, 4)
+RECEIPT_PDF_CHUNK_SIZE = 25
+
+# Кэш PDF-чеков на диске (None — без кэша) и его максимальный размер в байтах
+RECEIPT_PDF_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'receipts')
+RECEIPT_PDF_CACHE_MAX_SIZE = 500 * 1024 * 1024
+# Как часто (в секундах) проверять размер кэша и удалять давно не использованные файлы
+RECEIPT_PDF_CACHE_EVICT_INTERVAL = 3600
+
 
 # STORAGES = {
 #     "default": {
@@ -357,6 +402,11 @@ UNFOLD = {
                         "icon": "qr_code_2",
                         "link": reverse_lazy("admin:info_qr"),
                     },
+                    {
+                        "title": _("Фоновые задачи"),
+                        "icon": "pending_actions",
+                        "link": reverse_lazy("admin:qr_handler_backgroundjob_changelist"),
+                    },
                 ],
             },
             {
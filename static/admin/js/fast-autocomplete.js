@@ -0,0 +1,50 @@
+'use strict';
+// Инициализация Select2 для виджета FastAutocompleteSelect: следующая страница
+// запрашивается по ключу — параметр after берётся из pagination.next предыдущего ответа.
+{
+    const $ = django.jQuery;
+
+    $.fn.fastAdminSelect2 = function() {
+        $.each(this, function(i, element) {
+            // Ключи страниц по поисковой строке: "<term>:<номер страницы>" -> after
+            const cursors = {};
+            $(element).select2({
+                ajax: {
+                    data: (params) => {
+                        const page = params.page || 1;
+                        const query = {
+                            term: params.term,
+                            app_label: element.dataset.appLabel,
+                            model_name: element.dataset.modelName,
+                            field_name: element.dataset.fieldName,
+                        };
+                        const after = cursors[`${params.term || ""}:${page}`];
+                        if (after) {
+                            query.after = after;
+                        } else {
+                            query.page = page;
+                        }
+                        return query;
+                    },
+                    processResults: (data, params) => {
+                        const page = params.page || 1;
+                        if (data.pagination.next) {
+                            cursors[`${params.term || ""}:${page + 1}`] = data.pagination.next;
+                        }
+                        return {results: data.results, pagination: {more: data.pagination.more}};
+                    },
+                },
+            });
+        });
+        return this;
+    };
+
+    $(function() {
+        // Виджеты в пустой форме инлайна инициализируются при добавлении строки
+        $('.fast-admin-autocomplete').not('[name*=__prefix__]').fastAdminSelect2();
+    });
+
+    document.addEventListener('formset:added', (event) => {
+        $(event.target).find('.fast-admin-autocomplete').fastAdminSelect2();
+    });
+}
@@ -0,0 +1,117 @@
+// Очередь сканов в localStorage: сканы сохраняются на устройстве сразу,
+// а на сервер отправляются пачками, когда есть сеть.
+export default class ScanQueue {
+    constructor(storageKey, syncUrl, csrfToken, maxBatches = 100) {
+        this.storageKey = storageKey;
+        this.syncUrl = syncUrl;
+        this.csrfToken = csrfToken;
+        this.maxBatches = maxBatches || 100;
+        this.syncing = false;
+    }
+
+    load() {
+        try {
+            return JSON.parse(localStorage.getItem(this.storageKey)) || [];
+        } catch (error) {
+            return [];
+        }
+    }
+
+    save(batches) {
+        localStorage.setItem(this.storageKey, JSON.stringify(batches));
+    }
+
+    get size() {
+        return this.load().length;
+    }
+
+    // Добавляет пачку в очередь. Идентификатор пачки генерируется на устройстве,
+    // поэтому повторная отправка после обрыва связи не размещает заказы дважды.
+    push(batch) {
+        const batches = this.load();
+        const queued = {
+            batch_id: crypto.randomUUID(),
+            scanned_at: new Date().toISOString(),
+            ...batch,
+        };
+        batches.push(queued);
+        this.save(batches);
+        return queued;
+    }
+
+    // Отправляет очередь частями не больше maxBatches пачек, пока она не опустеет.
+    // Пачки, по которым сервер вернул ответ (результат или ошибку), удаляются из очереди;
+    // при ошибке сети очередь сохраняется. Если сервер отклонил запрос целиком,
+    // выбрасывается ScanSyncError с результатами уже отправленных частей.
+    async sync() {
+        if (this.syncing || !this.size || !navigator.onLine) {
+            return [];
+        }
+
+        this.syncing = true;
+        const results = [];
+        try {
+            let batches = this.load().slice(0, this.maxBatches);
+            while (batches.length) {
+                let response;
+                try {
+                    response = await fetch(this.syncUrl, {
+                        method: "POST",
+                        headers: {
+                            "Content-Type": "application/json",
+                            "X-CSRFToken": this.csrfToken,
+                        },
+                        // Время отправки по часам устройства: сервер по нему учитывает,
+                        // насколько часы устройства расходятся с серверными.
+                        body: JSON.stringify({sent_at: new Date().toISOString(), batches}),
+                    });
+                } catch (error) {
+                    break;
+                }
+                const data = await response.json().catch(() => ({}));
+                if (!response.ok) {
+                    throw new ScanSyncError(
+                        data.error || `Не удалось синхронизировать сканы (HTTP ${response.status}).`,
+                        results,
+                    );
+                }
+                const processed = new Set((data.batches || []).map(batch => batch.batch_id));
+                if (!processed.size) {
+                    break;
+                }
+                this.save(this.load().filter(batch => !processed.has(batch.batch_id)));
+                results.push(...data.batches);
+                batches = this.load().slice(0, this.maxBatches);
+            }
+            return results;
+        } finally {
+            this.syncing = false;
+        }
+    }
+
+    // Запускает синхронизацию при появлении сети и по таймеру. Ошибки сервера
+    // передаются в onError, чтобы очередь не зависала молча.
+    start(onSynced, onError = console.error, interval = 15000) {
+        const run = () => this.sync()
+            .then(results => results.length && onSynced(results))
+            .catch(error => {
+                if (error.results && error.results.length) {
+                    onSynced(error.results);
+                }
+                onError(error.message);
+            });
+        window.addEventListener("online", run);
+        setInterval(run, interval);
+        run();
+        return run;
+    }
+}
+
+// Сервер отклонил запрос синхронизации целиком (не ошибка сети).
+export class ScanSyncError extends Error {
+    constructor(message, results) {
+        super(message);
+        this.name = "ScanSyncError";
+        this.results = results;
+    }
+}
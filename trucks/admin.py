@@ -1,17 +1,19 @@
-from functools import lru_cache
+from functools import lru_cache, partial
 
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db.models import Count, Q
 from django.utils.safestring import mark_safe
 from unfold.admin import ModelAdmin  # Используем Unfold ModelAdmin
 
-from orders.models import Order
+from qr_handler.autocomplete import FastAutocompleteMixin
 from trucks.models import Route, Truck
+from trucks.services import RouteTransitionService
 from django.urls import reverse
 from django.utils.html import format_html
 
 
 @admin.register(Route)
-class RouteAdmin(ModelAdmin):  # Используем Unfold ModelAdmin
+class RouteAdmin(FastAutocompleteMixin, ModelAdmin):  # Используем Unfold ModelAdmin
     list_display = ('truck', 'unique_number', 'view_orders_button', 'display_status', 'created_at',)
     list_filter = ('status', 'truck', 'created_at', 'updated_at')
     search_fields = ('truck__name', 'unique_number')
@@ -26,22 +28,65 @@ class RouteAdmin(ModelAdmin):  # Используем Unfold ModelAdmin
     warn_unsaved_form = True  # Предупреждение о несохранённых изменениях
     actions_on_top = True  # Действия на верхней панели
     actions_on_bottom = False  # Действия на нижней панели отключены
+    list_select_related = ('truck',)
+
+    def get_actions(self, request):
+        """
+        Добавляет действия массового перевода выбранных маршрутов в каждый из статусов.
+        """
+        actions = super().get_actions(request)
+        if self.has_change_permission(request):
+            for status, label in Route.STATUS_CHOICES:
+                name = f"set_status_{status}"
+                actions[name] = (partial(RouteAdmin.change_status, status=status), name,
+                                 f"Перевести в статус «{label}»")
+        return actions
+
+    def change_status(self, request, queryset, status):
+        """
+        Переводит выбранные маршруты в статус `status`. Маршруты с заказами в пути
+        пропускаются, по каждому выводится сообщение.
+        """
+        transitioned, failures = RouteTransitionService.transition_many(queryset, status, user=request.user)
+        if transitioned:
+            messages.success(request, f"Статус изменён у маршрутов: {len(transitioned)}.")
+        for route, error in failures.items():
+            messages.error(request, f"{route.unique_number}: {error}")
+
+    def get_queryset(self, request):
+        """
+        Количество заказов считается в том же запросе, что и список маршрутов.
+        """
+        return super().get_queryset(request).annotate(orders_count=Count('orders'))
+
+    def get_autocomplete_queryset(self, request, term):
+        """
+        Автодополнение по началу номера маршрута или номера машины, без подсчёта заказов.
+        """
+        queryset = Route.objects.all()
+        if term:
+            term = term.strip().upper()
+            queryset = queryset.filter(
+                Q(unique_number__startswith=term)
+                | Q(truck__in=Truck.objects.filter(plate_number__startswith=term).values('pk'))
+            )
+        return queryset
 
     def view_orders_button(self, obj):
         """
         Кнопка для просмотра заказов, связанных с маршрутом.
         """
-        orders_count = Order.objects.filter(route_id=obj.id).count()
-        if orders_count > 0:
+        if obj.orders_count > 0:
             url = reverse('admin:orders_route_id', args=[obj.id])
             return format_html(
                 '<a class="button" href="{}">Заказы маршрута ({})</a>',
                 url,
-                orders_count
+                obj.orders_count
             )
         return format_html('<span style="color: gray;">Нет заказов</span>')
 
     view_orders_button.short_description = "Заказы"
+    view_orders_button.admin_order_field = "orders_count"
 
     @admin.display(description="Статус")
     def display_status(self, instance):
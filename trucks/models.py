@@ -1,5 +1,4 @@
-from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from services.unique_number_service import UniqueNumberService
 
 
@@ -52,44 +51,55 @@ class Route(models.Model):
         verbose_name_plural = "Маршруты"
         ordering = ['-created_at']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем статус из базы, чтобы при сохранении не перечитывать его отдельным запросом
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
+
+    def get_old_status(self):
+        """
+        Возвращает статус маршрута в базе (None для нового маршрута).
+        """
+        if self.pk is None:
+            return None
+        if not hasattr(self, "_loaded_status"):
+            self._loaded_status = Route.objects.filter(pk=self.pk).values_list("status", flat=True).first()
+        return self._loaded_status
+
     def clean(self):
         """Проверка на невозможность перевода маршрута в 'inactive' или 'completed' при активных заказах."""
-        if self.status in ['inactive', 'completed']:
-            problematic_orders = self.orders.filter(status__in=['loading', 'in_transit', 'unloading'])
-            if problematic_orders.exists():
-                order_numbers = ", ".join(problematic_orders.values_list("order_number", flat=True))
-                raise ValidationError(
-                    f"Невозможно установить статус '{self.get_status_display()}'. "
-                    f"Заказы с неподходящим статусом: {order_numbers}."
-                )
+        from .services import RouteTransitionService
+
+        old_status = self.get_old_status()
+        if self.status != old_status:
+            RouteTransitionService.validate(self, self.status)
+        # Переход уже проверен — save() после full_clean() не повторяет запрос по заказам
+        self._validated_transition = (old_status, self.status)
 
     def save(self, *args, **kwargs):
         """
         Проверка данных, генерация номера маршрута и обновление связанных заказов при изменении статуса.
         """
-        self.clean()  # Валидируем данные перед сохранением
+        from .services import RouteTransitionService
+
+        old_status = self.get_old_status()
+        status_changed = self.pk is not None and old_status != self.status
+        validated = self.__dict__.pop("_validated_transition", None) == (old_status, self.status)
+
+        if status_changed and not validated:
+            RouteTransitionService.validate(self, self.status)
 
         if not self.unique_number:
             self.unique_number = UniqueNumberService.generate_route_unique_number(self)
 
-        # Проверка и обновление статусов заказов
-        if self.pk:
-            old_status = Route.objects.get(pk=self.pk).status
-            if old_status != self.status:
-                self._update_orders_on_status_change()
-
-        super().save(*args, **kwargs)
-
-    def _update_orders_on_status_change(self):
-        """Обновляет статусы заказов при изменении статуса маршрута."""
-        status_map = {
-            'loading': 'loading',
-            'on_way': 'in_transit',
-            'unloading': 'unloading',
-        }
-        new_status = status_map.get(self.status)
-        if new_status:
-            self.orders.filter(status__in=['accepted', 'loading', 'in_transit', 'unloading']).update(status=new_status)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if status_changed:
+                RouteTransitionService.cascade_to_orders(self)
+
+        self._loaded_status = self.status
 
     def __str__(self):
         return f"{self.unique_number} - ({self.get_status_display()})"
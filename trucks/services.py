@@ -0,0 +1,155 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import Order
+from .models import Route
+
+
+class RouteTransitionService:
+    """
+    Переходы статусов маршрута и каскадное обновление статусов его заказов.
+    """
+    # Статус заказов, который соответствует статусу маршрута
+    ORDER_STATUS_MAP = {
+        'loading': 'loading',
+        'on_way': 'in_transit',
+        'unloading': 'unloading',
+    }
+    # Заказы в этих статусах следуют за статусом маршрута
+    ACTIVE_ORDER_STATUSES = ['accepted', 'loading', 'in_transit', 'unloading']
+    # Статусы маршрута, недопустимые при заказах в пути
+    CLOSED_ROUTE_STATUSES = ['inactive', 'completed']
+    BLOCKING_ORDER_STATUSES = ['loading', 'in_transit', 'unloading']
+
+    @staticmethod
+    def find_blocking_orders(route_ids, new_status):
+        """
+        Одним запросом находит заказы в пути у маршрутов, которые переводятся в статус `new_status`.
+
+        :param route_ids: ID маршрутов
+        :param new_status: Новый статус маршрутов
+        :return: Словарь {ID маршрута: [номера заказов]}
+        """
+        blocking = {}
+        if new_status not in RouteTransitionService.CLOSED_ROUTE_STATUSES:
+            return blocking
+        rows = Order.objects.filter(
+            route_id__in=route_ids, status__in=RouteTransitionService.BLOCKING_ORDER_STATUSES
+        ).values_list("route_id", "order_number")
+        for route_id, order_number in rows:
+            blocking.setdefault(route_id, []).append(order_number)
+        return blocking
+
+    @staticmethod
+    def get_error_message(route, new_status, order_numbers):
+        """
+        Сообщение о невозможности перевода маршрута из-за заказов в пути.
+        """
+        return (
+            f"Невозможно установить статус '{dict(route.STATUS_CHOICES).get(new_status, new_status)}'. "
+            f"Заказы с неподходящим статусом: {', '.join(order_numbers)}."
+        )
+
+    @staticmethod
+    def validate(route, new_status):
+        """
+        Проверяет, что маршрут можно перевести в статус `new_status`.
+
+        :param route: Сохранённый маршрут
+        :param new_status: Новый статус маршрута
+        :raises ValidationError: Если у маршрута есть заказы в пути
+        """
+        if route.pk is None:
+            return
+        order_numbers = RouteTransitionService.find_blocking_orders([route.pk], new_status).get(route.pk)
+        if order_numbers:
+            raise ValidationError(RouteTransitionService.get_error_message(route, new_status, order_numbers))
+
+    @staticmethod
+    def cascade_to_orders(route, user=None):
+        """
+        Переводит активные заказы маршрута в статус, соответствующий статусу маршрута:
+        одно UPDATE для заказов и одна пачка записей истории.
+
+        :param route: Маршрут с уже установленным новым статусом
+        :param user: Пользователь для записей истории (по умолчанию — из текущего запроса)
+        :return: Количество обновлённых заказов
+        """
+        return RouteTransitionService.cascade_many([route], route.status, user=user)
+
+    @staticmethod
+    @transaction.atomic
+    def cascade_many(routes, new_status, user=None):
+        """
+        Переводит активные заказы маршрутов в статус, соответствующий статусу `new_status`,
+        одним UPDATE и одной пачкой записей истории для всех маршрутов.
+
+        :param routes: Маршруты, уже переведённые в статус `new_status`
+        :param new_status: Новый статус маршрутов
+        :param user: Пользователь для записей истории (по умолчанию — из текущего запроса)
+        :return: Количество обновлённых заказов
+        """
+        new_order_status = RouteTransitionService.ORDER_STATUS_MAP.get(new_status)
+        routes = {route.pk: route for route in routes}
+        if not new_order_status or not routes:
+            return 0
+
+        orders = list(
+            Order.objects.select_for_update()
+            .filter(route_id__in=routes, status__in=RouteTransitionService.ACTIVE_ORDER_STATUSES)
+            .exclude(status=new_order_status)
+        )
+        if not orders:
+            return 0
+
+        now = timezone.now()
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update(status=new_order_status, updated_at=now)
+
+        for order in orders:
+            route = routes[order.route_id]
+            order.status = new_order_status
+            order.updated_at = now
+            order._change_reason = f"Статус маршрута {route.unique_number}: {route.get_status_display()}"
+        Order.history.bulk_history_create(orders, update=True, default_user=user, default_date=now)
+        return len(orders)
+
+    @staticmethod
+    @transaction.atomic
+    def transition_many(routes, new_status, user=None):
+        """
+        Переводит несколько маршрутов в статус `new_status`. Все маршруты проверяются
+        одним запросом по заказам; маршруты, которые перевести нельзя, пропускаются,
+        остальные обновляются вместе с заказами набором общих запросов.
+
+        :param routes: Выборка маршрутов
+        :param new_status: Новый статус
+        :param user: Пользователь для записей истории
+        :return: (список переведённых маршрутов, словарь {маршрут: сообщение об ошибке})
+        """
+        route_ids = list(routes.values_list("pk", flat=True))
+        routes = [
+            route for route in Route.objects.select_for_update().filter(pk__in=route_ids)
+            if route.status != new_status
+        ]
+        blocking = RouteTransitionService.find_blocking_orders([route.pk for route in routes], new_status)
+
+        failures = {
+            route: RouteTransitionService.get_error_message(route, new_status, blocking[route.pk])
+            for route in routes if route.pk in blocking
+        }
+        transitioned = [route for route in routes if route.pk not in blocking]
+        if not transitioned:
+            return transitioned, failures
+
+        now = timezone.now()
+        Route.objects.filter(pk__in=[route.pk for route in transitioned]).update(
+            status=new_status, updated_at=now
+        )
+        for route in transitioned:
+            route.status = new_status
+            route.updated_at = now
+            route._loaded_status = new_status
+
+        RouteTransitionService.cascade_many(transitioned, new_status, user=user)
+        return transitioned, failures
@@ -1,3 +1,202 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from crm.models import Client
+from orders.models import Order
+from .models import Truck, Route
+from .services import RouteTransitionService
+
+
+class RouteChangelistQueriesTest(TestCase):
+    """
+    Список маршрутов в админке выполняет фиксированное число запросов на страницу.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        cls.sender = Client.objects.create(full_name="Отправитель")
+        cls.receiver = Client.objects.create(full_name="Получатель")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create_routes(self, count):
+        start = Route.objects.count()
+        for index in range(start, start + count):
+            truck = Truck.objects.create(name=f"Фура {index}", plate_number=f"{index:03d}ABC")
+            route = Route.objects.create(truck=truck, status="loading", unique_number=f"R-{index}")
+            for _ in range(2):
+                Order.objects.create(
+                    sender=self.sender, receiver=self.receiver, route=route,
+                    seat_count=1, price=1000, paid_amount=0,
+                )
+
+    def count_changelist_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("admin:trucks_route_changelist"))
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_changelist_query_count_is_constant(self):
+        self.create_routes(1)
+        single = self.count_changelist_queries()
+
+        self.create_routes(9)
+        many = self.count_changelist_queries()
+
+        self.assertEqual(single, many)
+
+    def test_changelist_shows_orders_count(self):
+        self.create_routes(1)
+        response = self.client.get(reverse("admin:trucks_route_changelist"))
+        self.assertContains(response, "Заказы маршрута (2)")
+
+
+class RouteStatusCascadeTest(TestCase):
+    """
+    Смена статуса маршрута: проверка перехода и каскад на заказы.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sender = Client.objects.create(full_name="Отправитель")
+        cls.receiver = Client.objects.create(full_name="Получатель")
+
+    def setUp(self):
+        truck = Truck.objects.create(name="Фура", plate_number="001ABC")
+        self.route = Route.objects.create(truck=truck, status="loading", unique_number="R-1")
+        self.orders = [
+            Order.objects.create(
+                sender=self.sender, receiver=self.receiver, route=self.route,
+                seat_count=1, price=1000, paid_amount=0, status=status,
+            )
+            for status in ("loading", "loading", "accepted", "completed")
+        ]
+        self.route = Route.objects.get(pk=self.route.pk)
+
+    def test_full_clean_and_save_check_orders_once(self):
+        self.route.status = "completed"
+        Order.objects.filter(route=self.route).update(status="in_warehouse")
+
+        with patch.object(
+            RouteTransitionService, "find_blocking_orders", wraps=RouteTransitionService.find_blocking_orders,
+        ) as find_blocking_orders:
+            self.route.full_clean()
+            self.route.save()
+
+        self.assertEqual(find_blocking_orders.call_count, 1)
+        self.assertEqual(Route.objects.get(pk=self.route.pk).status, "completed")
+
+    def test_save_without_clean_still_validates(self):
+        self.route.status = "completed"
+
+        with self.assertRaises(ValidationError):
+            self.route.save()
+        self.assertEqual(Route.objects.get(pk=self.route.pk).status, "loading")
+
+    def test_cascade_updates_orders_with_one_update(self):
+        self.route.status = "on_way"
+
+        with CaptureQueriesContext(connection) as context:
+            self.route.save()
+
+        order_updates = [
+            query for query in context.captured_queries if query["sql"].startswith('UPDATE "orders_order"')
+        ]
+        self.assertEqual(len(order_updates), 1)
+        self.assertEqual(
+            list(Order.objects.filter(route=self.route).order_by("pk").values_list("status", flat=True)),
+            ["in_transit", "in_transit", "in_transit", "completed"],
+        )
+
+    def test_cascade_writes_history_with_route_reason(self):
+        self.route.status = "on_way"
+        self.route.save()
+
+        reason = f"Статус маршрута {self.route.unique_number}: В пути"
+        for order in self.orders[:3]:
+            record = Order.history.filter(id=order.pk).latest("history_date")
+            self.assertEqual((record.status, record.history_change_reason), ("in_transit", reason))
+        self.assertEqual(Order.history.filter(id=self.orders[3].pk).count(), 1)
+
+
+class RouteTransitionManyTest(TestCase):
+    """
+    Массовая смена статуса маршрутов из админки.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sender = Client.objects.create(full_name="Отправитель")
+        cls.receiver = Client.objects.create(full_name="Получатель")
+
+    def create_route(self, index, order_statuses):
+        truck = Truck.objects.create(name=f"Фура {index}", plate_number=f"{index:03d}ABC")
+        route = Route.objects.create(truck=truck, status="unloading", unique_number=f"R-{index}")
+        orders = [
+            Order.objects.create(
+                sender=self.sender, receiver=self.receiver, route=route,
+                seat_count=1, price=1000, paid_amount=0, status=status,
+            )
+            for status in order_statuses
+        ]
+        return route, orders
+
+    def transition(self, new_status="completed"):
+        return RouteTransitionService.transition_many(Route.objects.all(), new_status)
+
+    def test_valid_routes_move_and_blocked_are_reported(self):
+        valid, _ = self.create_route(1, ["in_warehouse", "completed"])
+        blocked, blocking_orders = self.create_route(2, ["unloading", "in_warehouse"])
+
+        transitioned, failures = self.transition()
+
+        self.assertEqual([route.pk for route in transitioned], [valid.pk])
+        self.assertEqual(Route.objects.get(pk=valid.pk).status, "completed")
+        self.assertEqual(Route.objects.get(pk=blocked.pk).status, "unloading")
+        self.assertEqual([route.pk for route in failures], [blocked.pk])
+        message = next(iter(failures.values()))
+        self.assertIn(blocking_orders[0].order_number, message)
+        self.assertNotIn(blocking_orders[1].order_number, message)
+
+    def test_orders_follow_transitioned_routes(self):
+        first, first_orders = self.create_route(1, ["accepted", "unloading", "completed"])
+        second, second_orders = self.create_route(2, ["in_transit"])
+        Route.objects.filter(pk__in=[first.pk, second.pk]).update(status="on_way")
+
+        transitioned, failures = self.transition("unloading")
+
+        self.assertEqual(len(transitioned), 2)
+        self.assertEqual(failures, {})
+        statuses = dict(Order.objects.values_list("pk", "status"))
+        self.assertEqual(
+            [statuses[order.pk] for order in first_orders + second_orders],
+            ["unloading", "unloading", "completed", "unloading"],
+        )
+
+    def count_transition_queries(self):
+        Route.objects.update(status="unloading")
+        with CaptureQueriesContext(connection) as context:
+            transitioned, failures = self.transition()
+        return len(context.captured_queries), len(transitioned), len(failures)
+
+    def test_query_count_does_not_depend_on_routes(self):
+        self.create_route(1, ["in_warehouse"])
+        self.create_route(2, ["unloading"])
+        single, _, _ = self.count_transition_queries()
+
+        for index in range(3, 8):
+            self.create_route(index, ["in_warehouse", "completed"])
+        for index in range(8, 11):
+            self.create_route(index, ["unloading", "in_warehouse"])
+        many, transitioned, failed = self.count_transition_queries()
 
-# Create your tests here.
+        self.assertEqual((transitioned, failed), (6, 4))
+        self.assertEqual(single, many)
@@ -1,9 +1,10 @@
 from django.contrib import admin
+from django.db.models import Count
 from django.urls import reverse
 from django.utils.html import format_html
 from unfold.admin import ModelAdmin, StackedInline, TabularInline
 
-from orders.models import Order
+from qr_handler.autocomplete import FastAutocompleteMixin
 from .models import Warehouse, Area, Sector, Shelf
 
 
@@ -66,6 +67,13 @@ class SectorAdmin(ModelAdmin):
     ordering = ("area__name", "name")
     readonly_fields = ("unique_id",)
     inlines = [ShelfInline]  # Только полки на уровне сектора
+    list_select_related = ("area__warehouse",)
+
+    def get_queryset(self, request):
+        """
+        Количество заказов (через полки сектора) считается в том же запросе, что и список.
+        """
+        return super().get_queryset(request).annotate(orders_count=Count("shelves__orders"))
 
     def get_warehouse(self, obj):
         return obj.area.warehouse.name
@@ -76,53 +84,69 @@ class SectorAdmin(ModelAdmin):
         """
         Кнопка для просмотра заказов, связанных с сектором (через связанные полки).
         """
-        # Подсчёт всех заказов, связанных с полками в текущем секторе
-        orders_count = Order.objects.filter(shelf__sector=obj).count()
-        if orders_count > 0:
+        if obj.orders_count > 0:
             # Генерация ссылки на кастомный фильтр
             url = reverse('admin:orders_shelf__sector_id', args=[obj.id])
             return format_html(
                 '<a class="button" href="{}">Заказы ({})</a>',
                 url,
-                orders_count
+                obj.orders_count
             )
         # Если заказов нет
         return format_html('<span style="color: gray;">Нет заказов</span>')
 
     view_orders_button.short_description = "Заказы"
+    view_orders_button.admin_order_field = "orders_count"
 
 
 @admin.register(Shelf)
-class ShelfAdmin(ModelAdmin):
-    """Админка для модели полки."""
-    list_display = ("unique_id", "surface", "sector", "sector_area", "sector_warehouse", 'view_orders_button')
-    search_fields = ("unique_id", "sector__name", "sector__area__name", "sector__area__warehouse__name")
+class ShelfAdmin(FastAutocompleteMixin, ModelAdmin):
+    """Админка для модели полки. Расположение читается из денормализованных полей полки."""
+    list_display = ("unique_id", "surface", "sector_display", "area_name", "warehouse_name", 'view_orders_button')
+    search_fields = ("unique_id", "sector_name", "area_name", "warehouse_name")
     list_filter = ("sector__area__warehouse", "sector__area", "surface")
-    ordering = ("sector__name", "surface")
+    ordering = ("sector_name", "surface")
     readonly_fields = ("unique_id",)
 
-    def sector_area(self, obj):
-        return obj.sector.area.name
+    def get_queryset(self, request):
+        """
+        Количество заказов считается в том же запросе, что и список полок.
+        """
+        return super().get_queryset(request).annotate(orders_count=Count("orders"))
+
+    def sector_display(self, obj):
+        return f"{obj.sector_unique_id} - {obj.sector_name}"
 
-    sector_area.short_description = "Область"
+    sector_display.short_description = "Сектор"
+    sector_display.admin_order_field = "sector_name"
 
-    def sector_warehouse(self, obj):
-        return obj.sector.area.warehouse.name
+    def get_autocomplete_queryset(self, request, term):
+        """
+        Автодополнение по началу уникального ID полки, без подсчёта заказов.
+        """
+        queryset = Shelf.objects.all()
+        if term:
+            queryset = queryset.filter(unique_id__startswith=term.strip().upper())
+        return queryset
 
-    sector_warehouse.short_description = "Склад"
+    def serialize_autocomplete_result(self, obj):
+        return {
+            "text": str(obj),
+            "location": f"{obj.warehouse_name} / {obj.area_name} / {obj.sector_name}",
+        }
 
     def view_orders_button(self, obj):
         """
-        Кнопка для просмотра заказов, связанных с маршрутом.
+        Кнопка для просмотра заказов, связанных с полкой.
         """
-        orders_count = Order.objects.filter(shelf_id=obj.id).count()
-        if orders_count > 0:
+        if obj.orders_count > 0:
             url = reverse('admin:orders_shelf_id', args=[obj.id])
             return format_html(
                 '<a class="button" href="{}">Заказы ({})</a>',
                 url,
-                orders_count
+                obj.orders_count
             )
         return format_html('<span style="color: gray;">Нет заказов</span>')
 
     view_orders_button.short_description = "Заказы"
+    view_orders_button.admin_order_field = "orders_count"
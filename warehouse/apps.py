@@ -5,3 +5,7 @@ class WarehouseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'warehouse'
     verbose_name = "Склад"
+
+    def ready(self):
+        # Регистрация обработчиков фоновых задач
+        from . import jobs  # noqa: F401
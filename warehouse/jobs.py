@@ -0,0 +1,11 @@
+from services.job_queue_service import JobQueueService
+from .models import Shelf
+
+
+@JobQueueService.register("warehouse.generate_qr_code")
+def generate_shelf_qr_code(shelf):
+    """
+    Генерирует QR-код полки и сохраняет путь к файлу.
+    """
+    shelf.build_qr_code()
+    Shelf.objects.filter(pk=shelf.pk).update(qr_code=shelf.qr_code.name)
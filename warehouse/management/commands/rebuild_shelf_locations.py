@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from warehouse.models import Sector
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает денормализованное расположение (склад, область, сектор) у всех полок."
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        updated = 0
+        for sector in Sector.objects.select_related("area__warehouse"):
+            updated += sector.shelves.update(**sector.get_shelf_location())
+        self.stdout.write(self.style.SUCCESS(f"Расположение обновлено у полок: {updated}"))
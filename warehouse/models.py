@@ -1,4 +1,5 @@
 from django.db import models
+from services.job_queue_service import JobQueueService
 from services.qr_code_service import QRCodeService
 from services.unique_number_service import UniqueNumberService
 
@@ -21,8 +22,21 @@ class Warehouse(models.Model):
                 model=Warehouse,
                 prefix="W"
             )
+        is_new = self._state.adding
         super().save(*args, **kwargs)
 
+        if not is_new:
+            Shelf.objects.filter(sector__area__warehouse=self).update(**self.get_shelf_location())
+
+    def get_shelf_location(self):
+        """
+        Возвращает значения денормализованных полей полки, относящиеся к складу.
+        """
+        return {
+            "warehouse_name": self.name,
+            "warehouse_unique_id": self.unique_id,
+        }
+
     def __str__(self):
         return f"{self.unique_id} - {self.name}"
 
@@ -55,8 +69,22 @@ class Area(models.Model):
                 prefix=f"{self.warehouse.unique_id}A",
                 filters={"warehouse": self.warehouse}
             )
+        is_new = self._state.adding
         super().save(*args, **kwargs)
 
+        if not is_new:
+            Shelf.objects.filter(sector__area=self).update(**self.get_shelf_location())
+
+    def get_shelf_location(self):
+        """
+        Возвращает значения денормализованных полей полки, относящиеся к области и складу.
+        """
+        return {
+            **self.warehouse.get_shelf_location(),
+            "area_name": self.name,
+            "area_unique_id": self.unique_id,
+        }
+
     def __str__(self):
         return f"{self.unique_id} - {self.name}"
 
@@ -89,14 +117,35 @@ class Sector(models.Model):
                 prefix=f"{self.area.warehouse.unique_id}{self.area.unique_id}-S",
                 filters={"area": self.area}
             )
+        is_new = self._state.adding
         super().save(*args, **kwargs)
 
+        if not is_new:
+            self.shelves.update(**self.get_shelf_location())
+
+    def get_shelf_location(self):
+        """
+        Возвращает значения денормализованных полей полки: сектор, область и склад.
+        """
+        return {
+            **self.area.get_shelf_location(),
+            "sector_name": self.name,
+            "sector_unique_id": self.unique_id,
+        }
+
     def __str__(self):
         return f"{self.unique_id} - {self.name}"
 
 
 class Shelf(models.Model):
-    """Модель для представления полок внутри сектора."""
+    """
+    Модель для представления полок внутри сектора.
+
+    Названия и ID склада, области и сектора хранятся в самой полке, чтобы списки
+    и QR-коды полок не обходили цепочку sector.area.warehouse. Поля заполняются
+    при сохранении полки и обновляются при сохранении склада, области или сектора;
+    полный пересчёт — `manage.py rebuild_shelf_locations`.
+    """
     sector = models.ForeignKey(
         Sector,
         on_delete=models.CASCADE,
@@ -133,33 +182,73 @@ class Shelf(models.Model):
         verbose_name="QR-код"
     )
 
+    # Денормализованное расположение полки
+    warehouse_name = models.CharField(max_length=255, blank=True, editable=False, verbose_name="Склад")
+    warehouse_unique_id = models.CharField(max_length=10, blank=True, editable=False, verbose_name="ID склада")
+    area_name = models.CharField(max_length=255, blank=True, editable=False, verbose_name="Область")
+    area_unique_id = models.CharField(max_length=20, blank=True, editable=False, verbose_name="ID области")
+    sector_name = models.CharField(max_length=255, blank=True, editable=False, verbose_name="Сектор")
+    sector_unique_id = models.CharField(max_length=30, blank=True, editable=False, verbose_name="ID сектора")
+
+    LOCATION_FIELDS = (
+        "warehouse_name", "warehouse_unique_id",
+        "area_name", "area_unique_id",
+        "sector_name", "sector_unique_id",
+    )
+
     class Meta:
         verbose_name = "Полка"
         verbose_name_plural = "Полки"
-        ordering = ["sector__name", "surface"]
+        ordering = ["sector_name", "surface"]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем сектор, чтобы при переносе полки обновить её расположение
+        instance._location_sector_id = instance.__dict__.get("sector_id")
+        return instance
+
+    def refresh_location(self):
+        """
+        Заполняет денормализованные поля расположения по текущему сектору.
+        """
+        for field, value in self.sector.get_shelf_location().items():
+            setattr(self, field, value)
+        self._location_sector_id = self.sector_id
 
     def save(self, *args, **kwargs):
-        # Сохраняем объект, чтобы получить первичный ключ и уникальный ID
+        """
+        Сохраняет полку одной записью в базу. Генерация QR-кода ставится в очередь фоновых задач.
+        """
+        is_new = self._state.adding
+
+        if self.sector_id != getattr(self, "_location_sector_id", None):
+            self.refresh_location()
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], *self.LOCATION_FIELDS}
+
         if not self.unique_id:
             self.unique_id = UniqueNumberService.generate_surface_unique_id(self)
-            super().save(*args, **kwargs)  # Первичное сохранение для получения pk
-
-        # Генерация QR-кода, если его ещё нет
-        if not self.qr_code:
-            QRCodeService.generate_qr_code(
-                instance=self,
-                qr_data=f"W{self.unique_id}",
-                text_parts=[
-                    f"{self.sector.area.warehouse.name}",
-                    f"{self.sector.area.name} {self.sector.name}",
-                    f"{self.unique_id}"
-                ],
-                file_prefix="W"
-            )
-            super().save(update_fields=["qr_code"])  # Сохраняем только QR-код
 
-        # Обычное сохранение (для других изменений)
         super().save(*args, **kwargs)
 
+        if is_new and not self.qr_code:
+            JobQueueService.enqueue("warehouse.generate_qr_code", self)
+
+    def build_qr_code(self):
+        """
+        Генерирует файл QR-кода полки. Сама запись в базе не обновляется.
+        """
+        QRCodeService.generate_qr_code(
+            instance=self,
+            qr_data=f"W{self.unique_id}",
+            text_parts=[
+                f"{self.warehouse_name}",
+                f"{self.area_name} {self.sector_name}",
+                f"{self.unique_id}"
+            ],
+            file_prefix="W"
+        )
+
     def __str__(self):
         return f"{self.unique_id}"
@@ -1,3 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from crm.models import Client
+from orders.models import Order
+from .models import Warehouse, Area, Sector, Shelf
+
+
+class ChangelistQueriesTest(TestCase):
+    """
+    Списки секторов и полок в админке выполняют фиксированное число запросов на страницу.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        cls.sender = Client.objects.create(full_name="Отправитель")
+        cls.receiver = Client.objects.create(full_name="Получатель")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create_sectors(self, count):
+        start = Sector.objects.count()
+        for index in range(start, start + count):
+            warehouse = Warehouse.objects.create(name=f"Склад {index}")
+            area = Area.objects.create(warehouse=warehouse, name=f"Область {index}")
+            sector = Sector.objects.create(area=area, name=f"Сектор {index}")
+            for surface in (Shelf.LOWER, Shelf.UPPER):
+                shelf = Shelf.objects.create(sector=sector, surface=surface)
+                Order.objects.create(
+                    sender=self.sender, receiver=self.receiver, shelf=shelf,
+                    seat_count=1, price=1000, paid_amount=0,
+                )
+
+    def count_changelist_queries(self, url_name):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assert_constant_queries(self, url_name):
+        self.create_sectors(1)
+        single = self.count_changelist_queries(url_name)
+
+        self.create_sectors(9)
+        many = self.count_changelist_queries(url_name)
+
+        self.assertEqual(single, many)
+
+    def test_sector_changelist_query_count_is_constant(self):
+        self.assert_constant_queries("admin:warehouse_sector_changelist")
+
+    def test_shelf_changelist_query_count_is_constant(self):
+        self.assert_constant_queries("admin:warehouse_shelf_changelist")
+
+    def test_sector_orders_count_goes_through_shelves(self):
+        self.create_sectors(1)
+        response = self.client.get(reverse("admin:warehouse_sector_changelist"))
+        self.assertContains(response, "Заказы (2)")
+
+        response = self.client.get(reverse("admin:warehouse_shelf_changelist"))
+        self.assertContains(response, "Заказы (1)", count=2)